@@ -0,0 +1,183 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date as Date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from records import MISSING, minute_of_day
+
+
+def _view(column):
+    """A NumPy view of an array column, sharing its memory"""
+    return np.frombuffer(column, dtype=column.typecode)
+
+
+class AttendanceColumns:
+    """Attendance history held as compact columns for long-range analytics
+
+    Each record becomes one slot in a handful of typed arrays: the date
+    as an ordinal, staff_id interned to an int, department and status as
+    small-int codes, and check-in/check-out as minutes of the day. With
+    NumPy installed the aggregations are vectorized over zero-copy views
+    of those arrays; without it they fall back to loops over the same
+    arrays.
+    """
+
+    def __init__(self):
+        self.dates = array('i')
+        self.staff = array('i')
+        self.departments = array('h')
+        self.statuses = array('h')
+        self.checkins = array('h')
+        self.checkouts = array('h')
+        self.staff_ids = []
+        self.department_names = []
+        self.status_names = []
+        self._codes = {'staff': {}, 'department': {}, 'status': {}}
+        self._ordinals = {}
+
+    @classmethod
+    def from_records(cls, records):
+        columns = cls()
+        for record in records:
+            columns.append(record)
+        return columns
+
+    def empty_like(self):
+        """Return empty columns sharing this one's codes, so the two can be joined with extend()"""
+        columns = AttendanceColumns()
+        columns.staff_ids = self.staff_ids
+        columns.department_names = self.department_names
+        columns.status_names = self.status_names
+        columns._codes = self._codes
+        columns._ordinals = self._ordinals
+        return columns
+
+    def extend(self, other):
+        """Append the rows of columns that share this one's codes"""
+        self.dates.extend(other.dates)
+        self.staff.extend(other.staff)
+        self.departments.extend(other.departments)
+        self.statuses.extend(other.statuses)
+        self.checkins.extend(other.checkins)
+        self.checkouts.extend(other.checkouts)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _code(self, kind, names, value):
+        codes = self._codes[kind]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, record):
+        """Add one record in the JSON shape"""
+        ordinal = self._ordinals.get(record['date'])
+        if ordinal is None:
+            ordinal = self._ordinals[record['date']] = Date.fromisoformat(record['date']).toordinal()
+        self.dates.append(ordinal)
+        self.staff.append(self._code('staff', self.staff_ids, record['staff_id']))
+        self.departments.append(self._code('department', self.department_names, record.get('department', '')))
+        self.statuses.append(self._code('status', self.status_names, record.get('status', '')))
+        self.checkins.append(minute_of_day(record.get('checkin_time')))
+        self.checkouts.append(minute_of_day(record.get('checkout_time')))
+
+    def _names(self, by):
+        return {'department': self.department_names, 'staff': self.staff_ids}[by]
+
+    def _column(self, by):
+        return {'department': self.departments, 'staff': self.staff}[by]
+
+    def status_counts(self, by='department'):
+        """Return {key: {status: count}} for every department or staff member"""
+        names = self._names(by)
+        n_statuses = len(self.status_names)
+        if np is not None:
+            keys = _view(self._column(by)).astype(np.int64)
+            flat = np.bincount(keys * n_statuses + _view(self.statuses), minlength=len(names) * n_statuses).tolist()
+        else:
+            flat = [0] * (len(names) * n_statuses)
+            for key, status in zip(self._column(by), self.statuses):
+                flat[key * n_statuses + status] += 1
+
+        result = {}
+        for key, name in enumerate(names):
+            row = flat[key * n_statuses:(key + 1) * n_statuses]
+            if any(row):
+                # Shared codes include keys with no rows here
+                result[name] = {status: count for status, count in zip(self.status_names, row) if count}
+        return result
+
+    def lateness(self, start='09:00', bucket=15):
+        """Histogram of minutes checked in after start, as {bucket start: count}"""
+        start_minute = minute_of_day(start)
+        if np is not None:
+            checkins = _view(self.checkins).astype(np.int32)
+            late = checkins[(checkins != MISSING) & (checkins > start_minute)] - start_minute
+            counts = np.bincount(late // bucket).tolist() if len(late) else []
+        else:
+            counts = []
+            for checkin in self.checkins:
+                if checkin != MISSING and checkin > start_minute:
+                    slot = (checkin - start_minute) // bucket
+                    if slot >= len(counts):
+                        counts.extend([0] * (slot + 1 - len(counts)))
+                    counts[slot] += 1
+        return {slot * bucket: count for slot, count in enumerate(counts) if count}
+
+    def work_minutes(self, by='department'):
+        """Total minutes between check-in and check-out per department or staff member"""
+        names = self._names(by)
+        if np is not None:
+            keys = _view(self._column(by))
+            checkins = _view(self.checkins).astype(np.int32)
+            checkouts = _view(self.checkouts).astype(np.int32)
+            done = (checkins != MISSING) & (checkouts != MISSING) & (checkouts >= checkins)
+            totals = np.bincount(keys[done], weights=checkouts[done] - checkins[done], minlength=len(names))
+            totals = [int(total) for total in totals]
+        else:
+            totals = [0] * len(names)
+            for key, checkin, checkout in zip(self._column(by), self.checkins, self.checkouts):
+                if checkin != MISSING and checkout != MISSING and checkout >= checkin:
+                    totals[key] += checkout - checkin
+        return {name: total for name, total in zip(names, totals) if total}
+
+
+class ColumnCache:
+    """Per-day AttendanceColumns kept between requests
+
+    Each day is built from the store once and rebuilt only when the
+    store's day_version() for it changes, such as after a check-in from
+    any worker. Every day shares one set of codes, so the columns for a
+    date range are the days' arrays joined end to end.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._codes = AttendanceColumns()
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def columns(self, date_from, date_to):
+        """Return AttendanceColumns for every record from date_from to date_to (inclusive)"""
+        dates = self.store.dates()
+        with self._lock:
+            columns = self._codes.empty_like()
+            for date in dates[bisect_left(dates, date_from):bisect_right(dates, date_to)]:
+                # Read before the records, so a write in between only means a rebuild next time
+                version = self.store.day_version(date)
+                cached = self._days.get(date)
+                if cached is None or cached[0] != version:
+                    day = self._codes.empty_like()
+                    for record in self.store.query(date, date):
+                        day.append(record)
+                    cached = self._days[date] = (version, day)
+                columns.extend(cached[1])
+            return columns
@@ -0,0 +1,180 @@
+"""Compare the columnar analytics engine with plain loops over JSON-shaped records
+
+Reports the whole /api/analytics request, from reading the store to the
+three aggregations: plain loops, the first request that builds every
+day's columns, a repeat served from the column cache, a repeat after one
+check-in, and one after a check-in by a second store on the same files
+(another gunicorn worker). Then each aggregation alone.
+
+    python benchmarks/bench_analytics.py --days 250 --staff 4000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from analytics import AttendanceColumns, ColumnCache, minute_of_day
+from storage import open_store
+from synthetic import iter_records, synthetic_history
+
+
+def dict_status_counts(records, by):
+    result = {}
+    for record in records:
+        statuses = result.setdefault(record[by], {})
+        statuses[record['status']] = statuses.get(record['status'], 0) + 1
+    return result
+
+
+def dict_lateness(records, start='09:00', bucket=15):
+    start_minute = minute_of_day(start)
+    result = {}
+    for record in records:
+        checkin = minute_of_day(record['checkin_time'])
+        if checkin > start_minute:
+            slot = (checkin - start_minute) // bucket * bucket
+            result[slot] = result.get(slot, 0) + 1
+    return result
+
+
+def dict_work_minutes(records, by):
+    result = {}
+    for record in records:
+        checkin = minute_of_day(record['checkin_time'])
+        checkout = minute_of_day(record['checkout_time'])
+        if checkin >= 0 and checkout >= checkin:
+            result[record[by]] = result.get(record[by], 0) + checkout - checkin
+    return result
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def dict_request(store, date_from, date_to):
+    """What the endpoint would cost with plain loops over the store's records"""
+    records = list(store.query(date_from, date_to))
+    return dict_status_counts(records, 'department'), dict_lateness(records), dict_work_minutes(records, 'department')
+
+
+def column_request(cache, date_from, date_to):
+    """What the endpoint costs: cached columns for the range, then the aggregations"""
+    columns = cache.columns(date_from, date_to)
+    return columns.status_counts('department'), columns.lateness(), columns.work_minutes('department')
+
+
+def bench_requests(history, mode):
+    """Time whole requests against a store holding history"""
+    dates = sorted(history)
+    date_from, date_to = dates[0], dates[-1]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'attendance.json')
+        store = open_store(mode, path)
+        store.save(history)
+        cache = ColumnCache(store)
+        expected, dicts = timed(dict_request, store, date_from, date_to)
+        got, cold = timed(column_request, cache, date_from, date_to)
+        assert got == expected
+        _, warm = timed(column_request, cache, date_from, date_to)
+        store.checkin(bench_record('bench', date_to))
+        _, after_checkin = timed(column_request, cache, date_from, date_to)
+        # Another worker's write reaches this store through a reload of the files
+        open_store(mode, path).checkin(bench_record('bench-other', date_to))
+        got, after_other = timed(column_request, cache, date_from, date_to)
+        assert got == dict_request(store, date_from, date_to)
+    return {
+        'dicts': dicts,
+        'columns_first': cold,
+        'columns_cached': warm,
+        'columns_after_checkin': after_checkin,
+        'columns_after_other_worker_checkin': after_other,
+    }
+
+
+def bench_record(staff_id, date):
+    return {
+        'staff_id': staff_id, 'staff_name': 'Bench', 'department': 'IT', 'status': 'Late',
+        'checkin_time': '09:20', 'checkout_time': '--:--', 'date': date
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=250)
+    parser.add_argument('--staff', type=int, default=4000)
+    parser.add_argument('--mode', choices=['json', 'journal', 'partitioned', 'sqlite'], default='json',
+                        help='storage layout for the whole-request timings')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    history = synthetic_history(args.days, args.staff)
+    requests = bench_requests(history, args.mode)
+    records = list(iter_records(history))
+    columns, build_seconds = timed(AttendanceColumns.from_records, records)
+
+    queries = {
+        'status_counts_by_department': (
+            lambda: dict_status_counts(records, 'department'),
+            lambda: columns.status_counts('department'),
+        ),
+        'status_counts_by_staff': (
+            lambda: dict_status_counts(records, 'staff_id'),
+            lambda: columns.status_counts('staff'),
+        ),
+        'lateness_histogram': (
+            lambda: dict_lateness(records),
+            lambda: columns.lateness(),
+        ),
+        'work_minutes_by_department': (
+            lambda: dict_work_minutes(records, 'department'),
+            lambda: columns.work_minutes('department'),
+        ),
+    }
+
+    numpy = analytics.np
+    results = {
+        'records': len(records),
+        'numpy': numpy is not None,
+        'mode': args.mode,
+        'requests': requests,
+        'columnar_build_seconds': build_seconds,
+        'queries': {},
+    }
+    for name, (plain, columnar) in queries.items():
+        expected, plain_seconds = timed(plain)
+        got, columnar_seconds = timed(columnar)
+        assert got == expected, name
+        timings = {'dicts': plain_seconds, 'columns': columnar_seconds}
+        if numpy is not None:
+            analytics.np = None
+            got, timings['columns_without_numpy'] = timed(columnar)
+            analytics.np = numpy
+            assert got == expected, name
+        results['queries'][name] = timings
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{len(records):,} records, numpy {"on" if numpy else "off"}, {args.mode} storage')
+    print('  whole request (department)')
+    for name, seconds in requests.items():
+        print(f'    {name:34} {seconds:7.3f}s  ({requests["dicts"] / seconds:.1f}x)')
+    print(f'  aggregations alone, on columns built once in {build_seconds:.2f}s')
+    for name, timings in results['queries'].items():
+        speedup = timings['dicts'] / timings['columns']
+        line = f'    {name:28} dicts {timings["dicts"]:7.3f}s  columns {timings["columns"]:7.3f}s  ({speedup:.0f}x)'
+        if 'columns_without_numpy' in timings:
+            line += f'  no numpy {timings["columns_without_numpy"]:7.3f}s'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Measure encode/decode throughput of the installed JSON codecs on synthetic attendance files
+
+    python benchmarks/bench_codec.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec
+from records import encode_record, records_from_json
+from synthetic import synthetic_history
+
+STAFF = 1000
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def old_dumps(data):
+    """What save_attendance() used to write"""
+    return json.dumps(data, indent=2, default=encode_record).encode('utf-8')
+
+
+def bench(name, dumps, loads, data, count):
+    encoded, encode_seconds = timed(dumps, data)
+    decoded, decode_seconds = timed(loads, encoded)
+    assert sum(map(len, decoded.values())) == count, name
+    return {
+        'bytes': len(encoded),
+        'encode_seconds': encode_seconds,
+        'decode_seconds': decode_seconds,
+        'encode_records_per_second': count / encode_seconds,
+        'decode_records_per_second': count / decode_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        # Records, like the stores hold in memory
+        data = records_from_json(synthetic_history(max(1, size // STAFF), min(size, STAFF)))
+        count = sum(map(len, data.values()))
+        runs = {'json indent=2 (before)': bench('old', old_dumps, json.loads, data, count)}
+        for name, make in codec.CODECS.items():
+            chosen = make()
+            runs[name] = bench(name, chosen.dumps, chosen.loads, data, count)
+        results[count] = runs
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for count, runs in results.items():
+        print(f'{count:,} records')
+        for name, run in runs.items():
+            print(f'  {name:24} {run["bytes"] / 2**20:8.1f} MiB'
+                  f'  encode {run["encode_records_per_second"]:>12,.0f} rec/s ({run["encode_seconds"]:.3f}s)'
+                  f'  decode {run["decode_records_per_second"]:>12,.0f} rec/s ({run["decode_seconds"]:.3f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Measure latency percentiles and throughput of /, /mark_attendance and /get_stats
+
+Seeds a synthetic history ending today into a temporary directory, then
+either drives the app in-process through Flask's test client or starts a
+local gunicorn and sends requests from several client processes.
+
+    python benchmarks/bench_endpoints.py --days 30 --staff 1000 --requests 500
+    python benchmarks/bench_endpoints.py --days 365 --staff 5000 --gunicorn 4 --clients 8 --output results.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import StaffRoster, open_store
+from synthetic import synthetic_history
+
+ENDPOINTS = ('checkin', 'checkout', 'index', 'get_stats')
+
+
+def endpoint_request(endpoint, n):
+    """Return (method, path, form) for the nth request to an endpoint"""
+    if endpoint == 'index':
+        return 'GET', '/', None
+    if endpoint == 'get_stats':
+        return 'GET', '/get_stats', None
+    # Staff outside the synthetic history, so none has checked in today yet
+    return 'POST', '/mark_attendance', {
+        'staff_id': f'bench-{n}',
+        'staff_name': f'Bench {n}',
+        'department': 'IT',
+        'status': 'Present',
+        'action': endpoint
+    }
+
+
+def summarize(latencies, errors, elapsed):
+    """Percentiles in milliseconds plus throughput for one endpoint"""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 if ordered else None
+
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000 if ordered else None,
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else None,
+        'requests_per_second': len(ordered) / elapsed if elapsed else None,
+    }
+
+
+def seed(directory, mode, days, staff, count):
+    """Write a history ending today in the chosen layout, and its roster, return the record count"""
+    start = date.today() - timedelta(days=days - 1)
+    data = synthetic_history(days, staff, start=start)
+    open_store(mode, os.path.join(directory, 'attendance.json')).save(data)
+    # The benchmark's own staff are on the roster too, so check-ins measure
+    # the usual path rather than adding a new staff member each time
+    roster = [
+        {'staff_id': record['staff_id'], 'staff_name': record['staff_name'], 'department': record['department']}
+        for record in data[start.isoformat()]
+    ]
+    for n in range(count):
+        form = endpoint_request('checkin', n)[2]
+        roster.append({field: form[field] for field in StaffRoster.FIELDS})
+    StaffRoster(os.path.join(directory, 'staff.json')).add_many(roster)
+    return days * staff
+
+
+def run_test_client(count):
+    """Drive the app in-process, one request at a time"""
+    # Imported here: main opens its store from the working directory
+    import main
+    client = main.app.test_client()
+    results = {}
+    for endpoint in ENDPOINTS:
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for n in range(count):
+            method, path, form = endpoint_request(endpoint, n)
+            request_started = time.perf_counter()
+            response = client.open(path, method=method, data=form)
+            response.get_data()
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code != 200 or b'type=error' in response.data
+        results[endpoint] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+
+def run_client(port, endpoint, numbers):
+    """Send one client's share of requests over a keep-alive connection"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies = []
+    errors = 0
+    for n in numbers:
+        method, path, form = endpoint_request(endpoint, n)
+        body = urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        request_started = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        latencies.append(time.perf_counter() - request_started)
+        errors += response.status != 200 or b'type=error' in data
+    conn.close()
+    return latencies, errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn did not start listening')
+
+
+def run_gunicorn(directory, env, workers, clients, count):
+    """Start gunicorn on the seeded directory and hit it from several processes"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', '4',
+         '-b', f'127.0.0.1:{port}', '--pythonpath', ROOT, 'main:app'],
+        cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port, server)
+        results = {}
+        with multiprocessing.Pool(clients) as pool:
+            for endpoint in ENDPOINTS:
+                shares = [(port, endpoint, range(c, count, clients)) for c in range(clients)]
+                started = time.perf_counter()
+                outcomes = pool.starmap(run_client, shares)
+                elapsed = time.perf_counter() - started
+                latencies = [latency for share, _ in outcomes for latency in share]
+                results[endpoint] = summarize(latencies, sum(errors for _, errors in outcomes), elapsed)
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30, help='days of history, 1 to 1825')
+    parser.add_argument('--staff', type=int, default=1000, help='staff per day, 100 to 50000')
+    parser.add_argument('--mode', choices=['json', 'journal', 'partitioned', 'sqlite'], default='json')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--gunicorn', type=int, default=0, metavar='WORKERS',
+                        help='run against a local gunicorn with this many workers instead of the test client')
+    parser.add_argument('--clients', type=int, default=4, help='client processes in gunicorn mode')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        records = seed(directory, args.mode, args.days, args.staff, args.requests)
+        env = dict(os.environ, ATTENDANCE_STORAGE=args.mode)
+        if args.gunicorn:
+            results = run_gunicorn(directory, env, args.gunicorn, args.clients, args.requests)
+        else:
+            os.environ.update(env)
+            os.chdir(directory)
+            results = run_test_client(args.requests)
+        os.chdir(ROOT)
+
+    report = {
+        'config': {
+            'days': args.days,
+            'staff': args.staff,
+            'records': records,
+            'mode': args.mode,
+            'runner': f'gunicorn x{args.gunicorn}, {args.clients} clients' if args.gunicorn else 'test client',
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'endpoints': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    config = report['config']
+    print(f'{config["records"]:,} records ({config["days"]} days x {config["staff"]} staff), '
+          f'{config["mode"]} storage, {config["runner"]}')
+    for endpoint, result in results.items():
+        print(f'  {endpoint:10} p50 {result["p50_ms"]:7.2f}ms  p90 {result["p90_ms"]:7.2f}ms  '
+              f'p99 {result["p99_ms"]:7.2f}ms  {result["requests_per_second"]:8.0f} req/s  '
+              f'errors {result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
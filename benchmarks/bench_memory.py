@@ -0,0 +1,64 @@
+"""Measure memory held by attendance history as JSON dicts versus compact Records
+
+    python benchmarks/bench_memory.py --days 25 --staff 4000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import records_from_json
+from synthetic import synthetic_history
+
+
+def measure(load, text):
+    """Return (bytes still allocated after load, seconds, loaded data)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = load(text)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, seconds, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=25)
+    parser.add_argument('--staff', type=int, default=4000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    # Load from text, like the stores do, so strings are not shared with the generator
+    text = json.dumps(synthetic_history(args.days, args.staff))
+    count = args.days * args.staff
+
+    dict_bytes, dict_seconds, dicts = measure(json.loads, text)
+    del dicts
+    record_bytes, record_seconds, records = measure(lambda text: records_from_json(json.loads(text)), text)
+    del records
+
+    results = {
+        'records': count,
+        'dicts': {'bytes': dict_bytes, 'bytes_per_record': dict_bytes / count, 'load_seconds': dict_seconds},
+        'records_compact': {'bytes': record_bytes, 'bytes_per_record': record_bytes / count, 'load_seconds': record_seconds},
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{count:,} records')
+    print(f'  dicts    {dict_bytes / 2**20:8.1f} MiB  {dict_bytes / count:6.0f} B/record  load {dict_seconds:.2f}s')
+    print(f'  Records  {record_bytes / 2**20:8.1f} MiB  {record_bytes / count:6.0f} B/record  load {record_seconds:.2f}s')
+    print(f'  {dict_bytes / record_bytes:.1f}x less memory')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Measure cold-start time to the first response against history size
+
+Each run starts a fresh interpreter on a seeded directory, imports main
+and sends GET /, then GET /get_stats and one check-in. For the json and
+journal layouts it also runs without the startup file, which is what
+every start cost before it existed. Files are in the page cache after
+seeding, so disk reads on a truly cold machine come on top.
+
+    python benchmarks/bench_startup.py --days 30 365 --staff 1000
+    python benchmarks/bench_startup.py --days 1825 --staff 1000 --modes json journal --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_endpoints import endpoint_request, seed
+from storage import open_store
+
+MODES = ('json', 'journal', 'partitioned', 'sqlite')
+STARTUP_FILE_MODES = ('json', 'journal')
+
+CHILD = '''
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+assert client.get('/').status_code == 200
+first = time.perf_counter()
+since_launch = time.time() - float(os.environ['BENCH_LAUNCHED'])
+assert client.get('/get_stats').status_code == 200
+stats = time.perf_counter()
+assert client.post('/mark_attendance', data={form!r}).status_code == 200
+checkin = time.perf_counter()
+print(json.dumps({{
+    'launch_to_first_response': since_launch,
+    'import': imported - started,
+    'first_response': first - imported,
+    'get_stats': stats - first,
+    'first_checkin': checkin - stats,
+}}))
+'''
+
+
+def start_once(directory, mode, n):
+    """Start the app in a new interpreter, return its timings in seconds"""
+    form = endpoint_request('checkin', n)[2]
+    env = dict(os.environ, ATTENDANCE_STORAGE=mode, BENCH_LAUNCHED=repr(time.time()))
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(root=ROOT, form=form)],
+        cwd=directory, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def bench(mode, days, staff, repeats, startup_file):
+    with tempfile.TemporaryDirectory() as directory:
+        records = seed(directory, mode, days, staff, repeats)
+        # Counts the seeded history into the rollups, which happens only once
+        open_store(mode, os.path.join(directory, 'attendance.json'))
+        runs = []
+        for n in range(repeats):
+            if not startup_file:
+                os.remove(os.path.join(directory, 'attendance.startup.json'))
+            runs.append(start_once(directory, mode, n))
+        bytes_on_disk = sum(
+            os.path.getsize(os.path.join(path, name))
+            for path, _, names in os.walk(directory) for name in names
+        )
+    medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    return {'records': records, 'bytes_on_disk': bytes_on_disk, **medians}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365], help='history sizes in days')
+    parser.add_argument('--staff', type=int, default=1000, help='staff per day')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--repeats', type=int, default=3, help='starts per configuration; the median is reported')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for days in args.days:
+        for mode in args.modes:
+            variants = (True, False) if mode in STARTUP_FILE_MODES else (True,)
+            for startup_file in variants:
+                result = bench(mode, days, args.staff, args.repeats, startup_file)
+                results.append({'days': days, 'mode': mode, 'startup_file': startup_file, **result})
+
+    report = {
+        'config': {
+            'staff': args.staff,
+            'repeats': args.repeats,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f'median of {args.repeats} starts, {args.staff} staff per day, times in ms')
+    print(f'{"days":>5} {"records":>10}  {"layout":24} {"launch->/":>10} {"import":>8} '
+          f'{"GET /":>8} {"stats":>8} {"checkin":>8}')
+    for result in results:
+        layout = result['mode'] if result['mode'] not in STARTUP_FILE_MODES else (
+            f'{result["mode"]} ' + ('(startup file)' if result['startup_file'] else '(full parse)'))
+        print(f'{result["days"]:>5} {result["records"]:>10,}  {layout:24} '
+              f'{result["launch_to_first_response"] * 1000:>10.0f} {result["import"] * 1000:>8.0f} '
+              f'{result["first_response"] * 1000:>8.1f} {result["get_stats"] * 1000:>8.1f} '
+              f'{result["first_checkin"] * 1000:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
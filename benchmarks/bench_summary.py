@@ -0,0 +1,82 @@
+"""Compare a staff summary built by scanning every day with the cached /api/staff/<id>/summary lookup
+
+    python benchmarks/bench_summary.py --days 365 --staff 1000 --lookups 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import open_store
+from summaries import StaffSummaries
+from synthetic import synthetic_history
+
+
+def scan(data, staff_id, today):
+    """What getting a summary took before: walk every day and scan its list"""
+    first = (date.fromisoformat(today) - timedelta(days=29)).isoformat()
+    statuses = {}
+    for day, records in data.items():
+        for record in records:
+            if record['staff_id'] == staff_id and first <= day <= today:
+                statuses[record['status']] = statuses.get(record['status'], 0) + 1
+    return statuses
+
+
+def timed(lookup, staff_ids):
+    started = time.perf_counter()
+    for staff_id in staff_ids:
+        lookup(staff_id)
+    return (time.perf_counter() - started) / len(staff_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--staff', type=int, default=1000)
+    parser.add_argument('--mode', choices=['json', 'journal', 'partitioned', 'sqlite'], default='json')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    today = date.today()
+    history = synthetic_history(args.days, args.staff, start=today - timedelta(days=args.days - 1))
+    staff_ids = [record['staff_id'] for record in history[today.isoformat()]]
+    lookups = [random.choice(staff_ids) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = open_store(args.mode, os.path.join(directory, 'attendance.json'))
+        store.save(history)
+        data = store.data()
+        summaries = StaffSummaries(store, capacity=len(staff_ids))
+        today = today.isoformat()
+
+        scan_seconds = timed(lambda staff_id: scan(data, staff_id, today), lookups[:max(1, args.lookups // 20)])
+        miss_seconds = timed(lambda staff_id: summaries.get(staff_id, today), staff_ids)
+        hit_seconds = timed(lambda staff_id: summaries.get(staff_id, today), lookups)
+
+    results = {
+        'records': args.days * args.staff,
+        'mode': args.mode,
+        'scan_ms': scan_seconds * 1000,
+        'cache_miss_ms': miss_seconds * 1000,
+        'cache_hit_ms': hit_seconds * 1000,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f'{results["records"]:,} records ({args.days} days x {args.staff} staff), {args.mode} storage, per lookup')
+    print(f'  scan every day   {results["scan_ms"]:9.3f}ms')
+    print(f'  cache miss       {results["cache_miss_ms"]:9.3f}ms')
+    print(f'  cache hit        {results["cache_hit_ms"]:9.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
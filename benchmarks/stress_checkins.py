@@ -0,0 +1,100 @@
+"""Fire concurrent check-ins from several processes and verify none are lost
+
+Each process opens its own store on the same files, like gunicorn workers
+do, and runs a few threads that check staff in and then out again.
+
+    python benchmarks/stress_checkins.py --mode journal --workers 8 --checkins 4000
+    python benchmarks/stress_checkins.py --mode json --threads 50 --group-commit 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import STORAGE_SECONDS
+from storage import open_store
+
+DATE = '2026-01-01'
+
+
+def run_worker(mode, directory, worker_id, checkins, threads, group_commit, writes):
+    store = open_store(mode, os.path.join(directory, 'attendance.json'))
+    if group_commit:
+        store.start_group_commit(group_commit / 1000)
+
+    def run_thread(thread_id):
+        staff_ids = [f'{worker_id}-{thread_id}-{n}' for n in range(thread_id, checkins, threads)]
+        for staff_id in staff_ids:
+            store.checkin({
+                'staff_id': staff_id,
+                'staff_name': f'Staff {staff_id}',
+                'department': 'IT',
+                'status': 'Present',
+                'checkin_time': '09:00',
+                'checkout_time': '--:--',
+                'date': DATE
+            })
+        for staff_id in staff_ids[::2]:
+            store.checkout(DATE, staff_id, '17:00')
+
+    pool = [threading.Thread(target=run_thread, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    with writes.get_lock():
+        writes.value += STORAGE_SECONDS.count('save')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['json', 'journal', 'partitioned', 'sqlite'], default='json')
+    parser.add_argument('--workers', type=int, default=4, help='processes sharing the store')
+    parser.add_argument('--threads', type=int, default=4, help='threads per process')
+    parser.add_argument('--checkins', type=int, default=2000, help='check-ins in total')
+    parser.add_argument('--group-commit', type=float, default=0, metavar='MS',
+                        help='batch writes arriving within this many milliseconds')
+    args = parser.parse_args()
+
+    per_worker = args.checkins // args.workers
+    writes = multiprocessing.Value('i', 0)
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(args.mode, directory, w, per_worker, args.threads, args.group_commit, writes)
+            )
+            for w in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        store = open_store(args.mode, os.path.join(directory, 'attendance.json'))
+        records = store.day(DATE)
+        counted = sum(sum(statuses.values()) for statuses in store.rollup(DATE[:7], 'department').values())
+        expected = per_worker * args.workers
+        checked_out = sum(1 for r in records if r['checkout_time'] != '--:--')
+        expected_out = sum(
+            len(range(t, per_worker, args.threads)[::2])
+            for t in range(args.threads)
+        ) * args.workers
+
+    print(f'{args.mode}: {expected} check-ins and {expected_out} check-outs '
+          f'from {args.workers}x{args.threads} writers in {elapsed:.2f}s, {writes.value} durable writes')
+    print(f'stored {len(records)} records, {checked_out} checked out, {counted} in rollups')
+    if len(records) != expected or checked_out != expected_out or counted != expected:
+        print('LOST UPDATES')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
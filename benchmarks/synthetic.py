@@ -0,0 +1,37 @@
+"""Synthetic attendance histories shaped like attendance.json"""
+import random
+from datetime import date, timedelta
+
+DEPARTMENTS = ['IT', 'HR', 'Sales', 'Marketing', 'Operations', 'Finance']
+STATUSES = ['Present', 'Late', 'Half Day', 'On Leave', 'Absent']
+STATUS_WEIGHTS = [70, 12, 5, 6, 7]
+
+
+def synthetic_history(days, staff, start=date(2024, 1, 1), seed=0):
+    """Return {date: [record, ...]} with one record per staff member per day"""
+    rng = random.Random(seed)
+    departments = [DEPARTMENTS[n % len(DEPARTMENTS)] for n in range(staff)]
+    data = {}
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        statuses = rng.choices(STATUSES, STATUS_WEIGHTS, k=staff)
+        records = []
+        for n in range(staff):
+            checkin = 8 * 60 + 30 + rng.randrange(90)
+            checkout = checkin + 8 * 60 + rng.randrange(60) if rng.random() < 0.9 else None
+            records.append({
+                'staff_id': str(1000 + n),
+                'staff_name': f'Staff {n}',
+                'department': departments[n],
+                'status': statuses[n],
+                'checkin_time': f'{checkin // 60:02d}:{checkin % 60:02d}',
+                'checkout_time': f'{checkout // 60:02d}:{checkout % 60:02d}' if checkout else '--:--',
+                'date': day
+            })
+        data[day] = records
+    return data
+
+
+def iter_records(data):
+    for records in data.values():
+        yield from records
@@ -0,0 +1,111 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+from records import encode_record
+
+# What loads() raises on malformed input, whichever codec is active
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else ValueError
+
+
+class Codec:
+    """JSON encoder/decoder used for every attendance file and log line
+
+    dumps() returns compact UTF-8 bytes, pretty() indented bytes for
+    people to read, and loads() accepts bytes or str. Records are
+    written in their JSON shape.
+    """
+
+    def __init__(self, name, dumps, loads, pretty):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        self.pretty = pretty
+
+    def __repr__(self):
+        return f'Codec({self.name!r})'
+
+
+def _stdlib_codec():
+    encoder = json.JSONEncoder(separators=(',', ':'), default=encode_record, check_circular=False)
+    return Codec(
+        'json',
+        lambda obj: encoder.encode(obj).encode('utf-8'),
+        json.loads,
+        lambda obj: json.dumps(obj, indent=2, default=encode_record).encode('utf-8')
+    )
+
+
+def _orjson_codec():
+    return Codec(
+        'orjson',
+        lambda obj: orjson.dumps(obj, default=encode_record),
+        orjson.loads,
+        lambda obj: orjson.dumps(obj, default=encode_record, option=orjson.OPT_INDENT_2)
+    )
+
+
+def _msgspec_codec():
+    encoder = msgspec.json.Encoder(enc_hook=encode_record)
+    decoder = msgspec.json.Decoder()
+    return Codec(
+        'msgspec',
+        encoder.encode,
+        decoder.decode,
+        lambda obj: msgspec.json.format(encoder.encode(obj), indent=2)
+    )
+
+
+CODECS = {'json': _stdlib_codec}
+if orjson is not None:
+    CODECS['orjson'] = _orjson_codec
+if msgspec is not None:
+    CODECS['msgspec'] = _msgspec_codec
+
+
+def get_codec(name=None):
+    """Return the named codec, or the fastest one installed"""
+    if name:
+        if name not in CODECS:
+            raise ValueError(f'JSON codec {name!r} is not installed (available: {", ".join(CODECS)})')
+        return CODECS[name]()
+    for preferred in ('msgspec', 'orjson', 'json'):
+        if preferred in CODECS:
+            return CODECS[preferred]()
+
+
+_active = get_codec()
+
+
+def use(name=None):
+    """Switch every later read and write to the named codec, return it"""
+    global _active
+    _active = get_codec(name)
+    return _active
+
+
+def active():
+    return _active
+
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes"""
+    return _active.dumps(obj)
+
+
+def loads(data):
+    """Decode JSON bytes or text"""
+    return _active.loads(data)
+
+
+def pretty(obj):
+    """Encode obj as indented JSON bytes for people to read"""
+    return _active.pretty(obj)
@@ -1,220 +1,96 @@
-from flask import Flask, request
+from flask import Flask, Response, g, jsonify, make_response, request
+import click
+import cProfile
+import csv
+import hashlib
+import io
 import json
 import os
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
+
+import codec
+import metrics
+from analytics import ColumnCache
+from storage import SQLiteAttendanceStore, StaffRoster, open_store, read_json
+from summaries import StaffSummaries
 
 app = Flask(__name__)
 
 ATTENDANCE_FILE = 'attendance.json'
+ATTENDANCE_DB = 'attendance.db'
+STAFF_FILE = 'staff.json'
+
+# 'journal' appends each check-in/check-out to a log instead of rewriting the file,
+# 'partitioned' keeps one file per day so requests only read today's records,
+# 'sqlite' keeps records in an indexed attendance.db
+STORAGE_MODE = os.environ.get('ATTENDANCE_STORAGE', 'json')
+COMPACT_INTERVAL = int(os.environ.get('ATTENDANCE_COMPACT_INTERVAL', '60'))
+# 'msgspec', 'orjson' or 'json'; unset picks the fastest one installed
+JSON_CODEC = os.environ.get('ATTENDANCE_JSON_CODEC')
+# Batch check-ins/check-outs arriving within this many milliseconds into
+# one durable write; 0 writes each one as it arrives
+GROUP_COMMIT_MS = float(os.environ.get('ATTENDANCE_GROUP_COMMIT_MS', '0'))
+# Requests slower than this many milliseconds dump a cProfile into
+# PROFILE_DIR; 0 turns profiling off
+PROFILE_SLOW_MS = float(os.environ.get('ATTENDANCE_PROFILE_SLOW_MS', '0'))
+PROFILE_DIR = os.environ.get('ATTENDANCE_PROFILE_DIR', 'profiles')
+# Staff whose /api/staff/<id>/summary is kept in memory; the least recently
+# looked up are dropped first
+SUMMARY_CACHE_SIZE = int(os.environ.get('ATTENDANCE_SUMMARY_CACHE_SIZE', '10000'))
+
+# How often /stats_stream checks for changes made by other workers
+STREAM_CHECK_INTERVAL = 5
+# Streams each worker holds open at once; every one ties up a thread, so
+# keep it below the worker's thread count. Pages over the limit get a 503
+# and poll /get_stats instead
+STREAM_LIMIT = int(os.environ.get('ATTENDANCE_STREAM_LIMIT', '2'))
+stream_slots = threading.BoundedSemaphore(STREAM_LIMIT) if STREAM_LIMIT > 0 else None
+
+codec.use(JSON_CODEC)
+
+# Opened once at startup; reads are served from memory, older days are read on first use
+store = open_store(STORAGE_MODE, ATTENDANCE_FILE)
+if STORAGE_MODE == 'journal':
+    store.start_compactor(COMPACT_INTERVAL)
+if GROUP_COMMIT_MS:
+    store.start_group_commit(GROUP_COMMIT_MS / 1000)
+
+# Staff by ID; check-ins take names and departments from here
+roster = StaffRoster(STAFF_FILE)
+
+# Last-30-day summaries per staff member, updated on each check-in
+summaries = StaffSummaries(store, SUMMARY_CACHE_SIZE)
+
+# Analytics columns per day, rebuilt only for days that changed
+analytics_columns = ColumnCache(store)
 
 def load_attendance():
-    """Load attendance data from file"""
-    try:
-        if os.path.exists(ATTENDANCE_FILE):
-            with open(ATTENDANCE_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return {}
+    """Load attendance data from the in-memory store"""
+    return store.data()
 
 def save_attendance(data):
-    """Save attendance data to file"""
-    with open(ATTENDANCE_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Save attendance data to memory and file"""
+    store.save(data)
 
-@app.route('/')
-def home():
-    # Sample staff data
-    staff_data = load_attendance()
+# Assets are referenced by content hash, so browsers can cache them for a year
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 365 * 24 * 60 * 60
+
+def asset_url(filename):
+    """Return the fingerprinted URL of a file in static/"""
+    with app.open_resource(f'static/{filename}') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f'/static/{filename}?v={digest}'
 
-    html = '''
+# Static parts of the home page, built once at startup
+PAGE_HEAD = '''
     <!DOCTYPE html>
     <html>
     <head>
         <title>👥 Staff Attendance System</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                max-width: 1000px;
-                margin: 0 auto;
-                padding: 20px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-            }
-            .container {
-                background: white;
-                padding: 30px;
-                border-radius: 20px;
-                box-shadow: 0 20px 40px rgba(0,0,0,0.2);
-            }
-            .header {
-                text-align: center;
-                margin-bottom: 30px;
-            }
-            .header h1 {
-                color: #333;
-                font-size: 2.5em;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                gap: 15px;
-            }
-            .date-time {
-                background: #f8f9fa;
-                padding: 15px;
-                border-radius: 10px;
-                text-align: center;
-                margin: 20px 0;
-                font-weight: bold;
-                color: #666;
-            }
-            .attendance-form {
-                background: #f8f9fa;
-                padding: 25px;
-                border-radius: 15px;
-                margin: 25px 0;
-            }
-            .form-group {
-                margin-bottom: 20px;
-            }
-            label {
-                display: block;
-                margin-bottom: 8px;
-                font-weight: bold;
-                color: #333;
-            }
-            input, select {
-                width: 100%;
-                padding: 12px;
-                border: 2px solid #ddd;
-                border-radius: 8px;
-                font-size: 16px;
-                box-sizing: border-box;
-            }
-            input:focus, select:focus {
-                outline: none;
-                border-color: #667eea;
-            }
-            .button-group {
-                display: flex;
-                gap: 15px;
-                margin-top: 25px;
-            }
-            button {
-                flex: 1;
-                padding: 15px;
-                border: none;
-                border-radius: 8px;
-                font-size: 18px;
-                font-weight: bold;
-                cursor: pointer;
-                transition: all 0.3s;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                gap: 10px;
-            }
-            .checkin-btn {
-                background: #28a745;
-                color: white;
-            }
-            .checkout-btn {
-                background: #ffc107;
-                color: #333;
-            }
-            button:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-            }
-            .attendance-table {
-                width: 100%;
-                border-collapse: collapse;
-                margin: 30px 0;
-                background: white;
-                border-radius: 10px;
-                overflow: hidden;
-                box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            }
-            .attendance-table th, .attendance-table td {
-                border: 1px solid #ddd;
-                padding: 15px;
-                text-align: left;
-            }
-            .attendance-table th {
-                background: #667eea;
-                color: white;
-            }
-            .attendance-table tr:nth-child(even) {
-                background: #f9f9f9;
-            }
-            .status-present {
-                background: #d4edda;
-                color: #155724;
-                padding: 5px 10px;
-                border-radius: 20px;
-                font-weight: bold;
-            }
-            .status-absent {
-                background: #f8d7da;
-                color: #721c24;
-                padding: 5px 10px;
-                border-radius: 20px;
-                font-weight: bold;
-            }
-            .status-onleave {
-                background: #fff3cd;
-                color: #856404;
-                padding: 5px 10px;
-                border-radius: 20px;
-                font-weight: bold;
-            }
-            .empty-state {
-                text-align: center;
-                padding: 40px;
-                color: #666;
-                font-size: 1.2em;
-            }
-            .stats-box {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin: 30px 0;
-            }
-            .stat-card {
-                background: white;
-                padding: 20px;
-                border-radius: 10px;
-                text-align: center;
-                box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-                border-top: 5px solid #667eea;
-            }
-            .stat-number {
-                font-size: 2.5em;
-                font-weight: bold;
-                color: #667eea;
-                margin: 10px 0;
-            }
-            .message {
-                padding: 15px;
-                border-radius: 10px;
-                margin: 15px 0;
-                text-align: center;
-                font-weight: bold;
-                display: none;
-            }
-            .success {
-                background: #d4edda;
-                color: #155724;
-                border: 1px solid #c3e6cb;
-                display: block;
-            }
-            .error {
-                background: #f8d7da;
-                color: #721c24;
-                border: 1px solid #f5c6cb;
-                display: block;
-            }
-        </style>
+        <link rel="stylesheet" href="{style_url}">
     </head>
     <body>
         <div class="container">
@@ -242,13 +118,13 @@ def home():
 
                     <div class="form-group">
                         <label for="staff_name">Staff Name:</label>
-                        <input type="text" id="staff_name" name="staff_name" placeholder="Enter Staff Name" required>
+                        <input type="text" id="staff_name" name="staff_name" placeholder="Only needed for new staff">
                     </div>
 
                     <div class="form-group">
                         <label for="department">Department:</label>
-                        <select id="department" name="department" required>
-                            <option value="">Select Department</option>
+                        <select id="department" name="department">
+                            <option value="">Select Department (new staff only)</option>
                             <option value="IT">💻 IT Department</option>
                             <option value="HR">👥 HR Department</option>
                             <option value="Sales">💰 Sales Department</option>
@@ -290,12 +166,26 @@ def home():
             <div>
                 <h2 style="color: #667eea; margin-bottom: 20px;">📊 Today's Attendance</h2>
                 <div id="attendanceTable">
-    '''
+    '''.format(style_url=asset_url('style.css'))
 
-    # Load today's attendance
-    today = datetime.now().strftime('%Y-%m-%d')
-    if today in staff_data:
-        html += '''
+PAGE_TAIL = '''
+                </div>
+            </div>
+
+            <!-- Message Display -->
+            <div id="message" class="message"></div>
+
+            <div style="text-align: center; margin-top: 40px; color: #666; font-size: 0.9em;">
+                <p>© Staff Attendance System | Made with Flask</p>
+            </div>
+        </div>
+
+        <script src="{script_url}"></script>
+    </body>
+    </html>
+    '''.format(script_url=asset_url('app.js'))
+
+TABLE_HEAD = '''
                     <table class="attendance-table">
                         <thead>
                             <tr>
@@ -310,177 +200,178 @@ def home():
                         <tbody>
         '''
 
-        for record in staff_data[today]:
-            status_class = {
-                'Present': 'status-present',
-                'Late': 'status-present',
-                'Half Day': 'status-present',
-                'On Leave': 'status-onleave',
-                'Absent': 'status-absent'
-            }.get(record.get('status', ''), '')
-
-            html += f'''
-                            <tr>
-                                <td>{record.get('staff_id', '')}</td>
-                                <td>{record.get('staff_name', '')}</td>
-                                <td>{record.get('department', '')}</td>
-                                <td>{record.get('checkin_time', '--:--')}</td>
-                                <td>{record.get('checkout_time', '--:--')}</td>
-                                <td><span class="{status_class}">{record.get('status', '')}</span></td>
-                            </tr>
-            '''
-
-        html += '''
+TABLE_TAIL = '''
                         </tbody>
                     </table>
         '''
-    else:
-        html += '''
+
+EMPTY_TABLE = '''
                     <div class="empty-state">
                         📭 No attendance records for today yet!
                     </div>
         '''
 
-    html += '''
-                </div>
-            </div>
-
-            <!-- Message Display -->
-            <div id="message" class="message"></div>
+LOAD_MORE_TEMPLATE = '''
+                    <button type="button" class="load-more-btn" id="loadMore" data-cursor="{cursor}">
+                        ⬇️ Load more (<span id="remaining">{remaining}</span> left)
+                    </button>
+        '''
 
-            <div style="text-align: center; margin-top: 40px; color: #666; font-size: 0.9em;">
-                <p>© Staff Attendance System | Made with Flask</p>
-            </div>
-        </div>
+ROW_TEMPLATE = '''
+                            <tr data-staff-id="{staff_id}">
+                                <td>{staff_id}</td>
+                                <td>{staff_name}</td>
+                                <td>{department}</td>
+                                <td>{checkin_time}</td>
+                                <td>{checkout_time}</td>
+                                <td><span class="{status_class}">{status}</span></td>
+                            </tr>
+            '''
 
-        <script>
-            // Update current date and time
-            function updateDateTime() {
-                const now = new Date();
-                const options = { 
-                    weekday: 'long', 
-                    year: 'numeric', 
-                    month: 'long', 
-                    day: 'numeric',
-                    hour: '2-digit',
-                    minute: '2-digit',
-                    second: '2-digit'
-                };
-                document.getElementById('currentDateTime').textContent = 
-                    '📅 ' + now.toLocaleDateString('en-US', options);
-            }
-
-            // Update stats
-            async function updateStats() {
-                try {
-                    const response = await fetch('/get_stats');
-                    const data = await response.json();
-
-                    if (data.success) {
-                        const statsBox = document.getElementById('statsSection');
-                        statsBox.innerHTML = `
-                            <div class="stat-card">
-                                <div>👥 Total Staff</div>
-                                <div class="stat-number">${data.total_staff}</div>
-                                <div>Today</div>
-                            </div>
-                            <div class="stat-card">
-                                <div>✅ Present</div>
-                                <div class="stat-number">${data.present}</div>
-                                <div>${data.present_percentage}%</div>
-                            </div>
-                            <div class="stat-card">
-                                <div>⏰ Late</div>
-                                <div class="stat-number">${data.late}</div>
-                                <div>${data.late_percentage}%</div>
-                            </div>
-                            <div class="stat-card">
-                                <div>❌ Absent</div>
-                                <div class="stat-number">${data.absent}</div>
-                                <div>${data.absent_percentage}%</div>
-                            </div>
-                        `;
-                    }
-                } catch (error) {
-                    console.error('Error loading stats:', error);
-                }
-            }
-
-            // Show message
-            function showMessage(text, type) {
-                const messageDiv = document.getElementById('message');
-                messageDiv.textContent = text;
-                messageDiv.className = `message ${type}`;
-
-                // Auto-hide after 5 seconds
-                setTimeout(() => {
-                    messageDiv.style.display = 'none';
-                }, 5000);
-            }
-
-            // Handle form submission
-            document.getElementById('attendanceForm').addEventListener('submit', async function(e) {
-                e.preventDefault();
-
-                const formData = new FormData(this);
-                const action = formData.get('action');
-
-                try {
-                    const response = await fetch('/mark_attendance', {
-                        method: 'POST',
-                        body: formData
-                    });
-
-                    const result = await response.text();
-
-                    // Check if response contains success message
-                    if (result.includes('success')) {
-                        const match = result.match(/message=(.*?)&type=(.*?)'/);
-                        if (match) {
-                            const message = decodeURIComponent(match[1]);
-                            const type = match[2];
-                            showMessage(message, type);
-
-                            // Refresh page after 2 seconds
-                            setTimeout(() => {
-                                location.reload();
-                            }, 2000);
-                        }
-                    } else {
-                        showMessage('❌ Error processing attendance!', 'error');
-                    }
-                } catch (error) {
-                    showMessage('❌ Network error! Please try again.', 'error');
-                    console.error('Error:', error);
-                }
-            });
-
-            // Load stats when page loads
-            window.onload = function() {
-                updateDateTime();
-                updateStats();
-
-                // Update time every second
-                setInterval(updateDateTime, 1000);
-
-                // Update stats every 30 seconds
-                setInterval(updateStats, 30000);
-
-                // Show message from URL parameters
-                const urlParams = new URLSearchParams(window.location.search);
-                const message = urlParams.get('message');
-                const messageType = urlParams.get('type');
-
-                if (message) {
-                    showMessage(decodeURIComponent(message), messageType);
-                }
-            };
-        </script>
-    </body>
-    </html>
-    '''
+STATUS_CLASSES = {
+    'Present': 'status-present',
+    'Late': 'status-present',
+    'Half Day': 'status-present',
+    'On Leave': 'status-onleave',
+    'Absent': 'status-absent'
+}
+
+# Rendered attendance table per date, as (data version, html, page etag)
+table_cache = {}
+
+# Rows in the page's first render and in each /api/attendance/today page by default
+TABLE_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def render_row(record):
+    """Render one attendance record as a table row"""
+    status = record.get('status', '')
+    return ROW_TEMPLATE.format(
+        staff_id=record.get('staff_id', ''),
+        staff_name=record.get('staff_name', ''),
+        department=record.get('department', ''),
+        checkin_time=record.get('checkin_time', '--:--'),
+        checkout_time=record.get('checkout_time', '--:--'),
+        status_class=STATUS_CLASSES.get(status, ''),
+        status=status
+    )
+
+def render_table(date):
+    """Render the attendance table for a date and the ETag of the page around it
+
+    Both are reused until the day's data changes.
+    """
+    # Read the version before the records so a concurrent write can only
+    # make the cached html newer than its key, never older
+    version = store.counts(date).version
+    cached = table_cache.get(date)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+
+    # Only the first page; the browser fetches the rest on demand
+    records, total, next_key = store.page(date, limit=TABLE_PAGE_SIZE)
+    with metrics.RENDER_SECONDS.time('table'):
+        if records:
+            html = TABLE_HEAD + ''.join(map(render_row, records)) + TABLE_TAIL
+            if next_key:
+                html += LOAD_MORE_TEMPLATE.format(cursor=encode_cursor(next_key), remaining=total - len(records))
+        else:
+            html = EMPTY_TABLE
+
+        # Hash the content rather than the version, so every worker gives the
+        # same page the same ETag
+        etag = hashlib.sha1((PAGE_HEAD + html + PAGE_TAIL).encode('utf-8')).hexdigest()
+
+    # Only today's table is requested, so older dates are dropped
+    table_cache.clear()
+    table_cache[date] = (version, html, etag)
+    return html, etag
+
+def encode_cursor(key):
+    """Turn a DayIndex page key into an opaque cursor string"""
+    return f'{key[0]}.{key[1]}'
+
+def decode_cursor(cursor):
+    """Turn a cursor string back into a page key, raising ValueError if malformed"""
+    minute, position = cursor.split('.')
+    return int(minute), int(position)
+
+def conditional(response, etag=None):
+    """Tag a response and turn it into a 304 when the client already has it"""
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    # Cache, but always revalidate: the data changes with every check-in
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_SLOW_MS:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active; skip this request
+            return
+        g.profiler = profiler
+
+@app.teardown_request
+def record_request_time(exc):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    # The rule, not the path, so unknown URLs cannot add unbounded series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_SECONDS.observe(elapsed, route, request.method)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            dump_profile(profiler, route, elapsed)
+
+def dump_profile(profiler, route, elapsed):
+    """Write a slow request's profile to PROFILE_DIR, for pstats or snakeviz"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'home'
+    filename = f'{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{request.method}-{name}-{elapsed * 1000:.0f}ms.prof'
+    profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+    metrics.SLOW_PROFILES.inc()
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request latency, storage and render timings in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-    return html
+@app.route('/')
+def home():
+    # Load today's attendance
+    today = datetime.now().strftime('%Y-%m-%d')
+    table, etag = render_table(today)
+    return conditional(make_response(PAGE_HEAD + table + PAGE_TAIL), etag)
+
+def resolve_staff(staff_id, staff_name='', department=''):
+    """Look a staff member up in the roster, adding them when a name and department are given"""
+    staff = roster.get(staff_id)
+    if staff is None and staff_name and department:
+        staff = roster.add(staff_id, staff_name, department)
+    return staff
+
+def new_record(staff_id, staff_name, department, status, date, checkin_time):
+    """Build the record stored for a check-in"""
+    return {
+        'staff_id': staff_id,
+        'staff_name': staff_name,
+        'department': department,
+        'status': status,
+        'checkin_time': checkin_time,
+        'checkout_time': '--:--',
+        'date': date
+    }
 
 @app.route('/mark_attendance', methods=['POST'])
 def mark_attendance():
@@ -493,114 +384,618 @@ def mark_attendance():
         action = request.form.get('action', 'checkin')
 
         # Validate inputs
-        if not all([staff_id, staff_name, department, status]):
+        if not staff_id or (action == 'checkin' and not status):
             message = "❌ Please fill all fields!"
             return f'<script>window.location.href="/?message={message}&type=error";</script>'
 
-        # Load existing attendance
-        attendance_data = load_attendance()
         today = datetime.now().strftime('%Y-%m-%d')
         current_time = datetime.now().strftime('%H:%M')
 
-        # Initialize today's records if not exists
-        if today not in attendance_data:
-            attendance_data[today] = []
+        if action == 'checkin':
+            # Only a check-in enrols new staff, as in the batch API
+            staff = resolve_staff(staff_id, staff_name, department)
+            if staff is None:
+                message = f"❌ Staff ID {staff_id} is not on the roster! Enter a name and department to add them."
+                return f'<script>window.location.href="/?message={message}&type=error";</script>'
+            staff_name = staff['staff_name']
 
-        # Check if staff already marked attendance today
-        existing_record = None
-        for record in attendance_data[today]:
-            if record['staff_id'] == staff_id:
-                existing_record = record
-                break
+            # Add new check-in record
+            record = new_record(staff_id, staff_name, staff['department'], status, today, current_time)
+            outcome = store.checkin(record)
 
-        if action == 'checkin':
-            if existing_record:
+            if outcome == 'duplicate':
                 message = f"❌ {staff_name} already checked in today!"
                 return f'<script>window.location.href="/?message={message}&type=error";</script>'
 
-            # Add new check-in record
-            attendance_data[today].append({
-                'staff_id': staff_id,
-                'staff_name': staff_name,
-                'department': department,
-                'status': status,
-                'checkin_time': current_time,
-                'checkout_time': '--:--',
-                'date': today
-            })
+            summaries.record(record)
 
             message = f"✅ {staff_name} checked in successfully at {current_time}!"
 
         elif action == 'checkout':
-            if not existing_record:
+            # Update checkout time; staff missing from the roster can still check out
+            staff = roster.get(staff_id)
+            staff_name = staff['staff_name'] if staff is not None else staff_name or staff_id
+            outcome = store.checkout(today, staff_id, current_time)
+
+            if outcome == 'not_checked_in':
                 message = f"❌ {staff_name} hasn't checked in today!"
                 return f'<script>window.location.href="/?message={message}&type=error";</script>'
 
-            if existing_record['checkout_time'] != '--:--':
+            if outcome == 'already_checked_out':
                 message = f"❌ {staff_name} already checked out today!"
                 return f'<script>window.location.href="/?message={message}&type=error";</script>'
 
-            # Update checkout time
-            existing_record['checkout_time'] = current_time
             message = f"✅ {staff_name} checked out successfully at {current_time}!"
 
-        # Save attendance data
-        save_attendance(attendance_data)
-
         return f'<script>window.location.href="/?message={message}&type=success";</script>'
 
     except Exception as e:
         message = f"❌ Error: {str(e)}"
         return f'<script>window.location.href="/?message={message}&type=error";</script>'
 
-@app.route('/get_stats')
-def get_stats():
-    """Get attendance statistics"""
-    try:
-        attendance_data = load_attendance()
-        today = datetime.now().strftime('%Y-%m-%d')
+BATCH_FIELDS = ('staff_id', 'staff_name', 'department', 'status')
+MAX_BATCH_SIZE = 10000
+
+def parse_batch_event(item, now, new_staff):
+    """Turn one batch item into a store event, return (event, error)
 
-        if today not in attendance_data:
-            return {
-                'success': True,
-                'total_staff': 0,
-                'present': 0,
-                'late': 0,
-                'absent': 0,
-                'present_percentage': 0,
-                'late_percentage': 0,
-                'absent_percentage': 0
-            }
-
-        today_records = attendance_data[today]
-        total_staff = len(today_records)
-
-        # Count statuses
-        present = sum(1 for r in today_records if r['status'] in ['Present', 'Late', 'Half Day'])
-        late = sum(1 for r in today_records if r['status'] == 'Late')
-        absent = sum(1 for r in today_records if r['status'] == 'Absent')
-
-        # Calculate percentages
-        present_percentage = round((present / total_staff) * 100, 1) if total_staff > 0 else 0
-        late_percentage = round((late / total_staff) * 100, 1) if total_staff > 0 else 0
-        absent_percentage = round((absent / total_staff) * 100, 1) if total_staff > 0 else 0
+    Staff missing from the roster but given with a name and department
+    are collected in new_staff, to be added before the events apply.
+    """
+    if not isinstance(item, dict):
+        return None, 'Event must be an object'
+
+    # Same required fields as the form
+    fields = {name: str(item.get(name) or '').strip() for name in BATCH_FIELDS}
+    action = item.get('action', 'checkin')
+    if not fields['staff_id'] or (action == 'checkin' and not fields['status']):
+        return None, 'Please fill all fields'
+
+    # Badge readers send the swipe time; default to now like the form
+    date = item.get('date') or now.strftime('%Y-%m-%d')
+    time = item.get('time') or now.strftime('%H:%M')
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+        datetime.strptime(time, '%H:%M')
+    except (TypeError, ValueError):
+        return None, 'date must be YYYY-MM-DD and time HH:MM'
+
+    if action == 'checkin':
+        staff = roster.get(fields['staff_id']) or new_staff.get(fields['staff_id'])
+        if staff is None:
+            if not (fields['staff_name'] and fields['department']):
+                return None, 'Staff ID is not on the roster; give staff_name and department to add them'
+            staff = new_staff[fields['staff_id']] = {name: fields[name] for name in StaffRoster.FIELDS}
+        record = new_record(fields['staff_id'], staff['staff_name'], staff['department'], fields['status'], date, time)
+        return {'op': 'checkin', 'record': record}, None
+    if action == 'checkout':
+        return {'op': 'checkout', 'date': date, 'staff_id': fields['staff_id'], 'time': time}, None
+    return None, f'Unknown action: {action}'
+
+@app.route('/api/attendance/batch', methods=['POST'])
+def attendance_batch():
+    """Apply a JSON array of checkin/checkout events in one transaction"""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return {'success': False, 'error': 'Expected a JSON array of events'}, 400
+    if len(items) > MAX_BATCH_SIZE:
+        return {'success': False, 'error': f'At most {MAX_BATCH_SIZE} events per batch'}, 413
+
+    now = datetime.now()
+    new_staff = {}
+    results = [None] * len(items)
+    events = []
+    positions = []
+    for position, item in enumerate(items):
+        event, error = parse_batch_event(item, now, new_staff)
+        if error:
+            results[position] = {'status': 'invalid', 'error': error}
+        else:
+            events.append(event)
+            positions.append(position)
 
+    try:
+        # One roster write for every new staff member in the batch
+        roster.add_many(new_staff.values())
+        outcomes = store.apply(events)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+    for position, event, outcome in zip(positions, events, outcomes):
+        results[position] = {'status': outcome}
+        if outcome == 'accepted' and event['op'] == 'checkin':
+            summaries.record(event['record'])
+
+    return {
+        'success': True,
+        'accepted': outcomes.count('accepted'),
+        'results': results
+    }
+
+RECORD_FIELDS = ('date', 'staff_id', 'staff_name', 'department', 'status', 'checkin_time', 'checkout_time')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def chunked(lines):
+    """Group small text lines into chunks of about STREAM_CHUNK_SIZE characters"""
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+def ndjson_lines(records):
+    """One JSON object per record"""
+    for record in records:
+        yield codec.dumps({field: record.get(field, '') for field in RECORD_FIELDS}).decode('utf-8') + '\n'
+
+def csv_lines(records):
+    """A header row, then one CSV row per record"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RECORD_FIELDS)
+    for record in records:
+        writer.writerow([record.get(field, '') for field in RECORD_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/api/attendance')
+def attendance_query():
+    """Stream attendance records for a date range as NDJSON or CSV"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    date_from = request.args.get('from', today)
+    date_to = request.args.get('to', date_from)
+    output = request.args.get('format', 'ndjson')
+    try:
+        datetime.strptime(date_from, '%Y-%m-%d')
+        datetime.strptime(date_to, '%Y-%m-%d')
+    except ValueError:
+        return {'success': False, 'error': 'from and to must be YYYY-MM-DD'}, 400
+    if output not in ('ndjson', 'csv'):
+        return {'success': False, 'error': 'format must be ndjson or csv'}, 400
+
+    records = store.query(
+        date_from,
+        date_to,
+        staff_id=request.args.get('staff_id', '').strip() or None,
+        department=request.args.get('department', '').strip() or None,
+        status=request.args.get('status', '').strip() or None
+    )
+
+    # Records are read and written a chunk at a time, so even a multi-year
+    # export never holds the whole response in memory
+    if output == 'csv':
+        return Response(chunked(csv_lines(records)), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=attendance_{date_from}_{date_to}.csv'
+        })
+    return Response(chunked(ndjson_lines(records)), mimetype='application/x-ndjson')
+
+@app.route('/api/attendance/today')
+def attendance_today():
+    """One page of today's records in check-in order, optionally filtered by department and status"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    sort = request.args.get('sort', 'checkin')
+    if sort not in ('checkin', '-checkin'):
+        return {'success': False, 'error': 'sort must be checkin or -checkin'}, 400
+    try:
+        limit = min(int(request.args.get('limit', TABLE_PAGE_SIZE)), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return {'success': False, 'error': 'limit must be a number and cursor one returned by this endpoint'}, 400
+    if limit < 1:
+        return {'success': False, 'error': 'limit must be at least 1'}, 400
+
+    records, total, next_key = store.page(
+        today,
+        after=after,
+        limit=limit,
+        descending=sort == '-checkin',
+        department=request.args.get('department', '').strip() or None,
+        status=request.args.get('status', '').strip() or None
+    )
+    return {
+        'success': True,
+        'date': today,
+        'total': total,
+        'records': [{field: record.get(field, '') for field in RECORD_FIELDS} for record in records],
+        'next_cursor': encode_cursor(next_key) if next_key else None
+    }
+
+def day_stats(date):
+    """Attendance statistics for a date, from the store's and the roster's running counters"""
+    counts = store.counts(date)
+    headcount = roster.headcount()
+
+    if not counts.total and not headcount:
         return {
             'success': True,
-            'total_staff': total_staff,
-            'present': present,
-            'late': late,
-            'absent': absent,
-            'present_percentage': present_percentage,
-            'late_percentage': late_percentage,
-            'absent_percentage': absent_percentage
+            'total_staff': 0,
+            'checked_in': 0,
+            'not_checked_in': 0,
+            'present': 0,
+            'late': 0,
+            'absent': 0,
+            'present_percentage': 0,
+            'late_percentage': 0,
+            'absent_percentage': 0,
+            'departments': {},
+            'not_checked_in_by_department': {}
+        }
+
+    # Only records of staff on the roster count against it: older check-ins
+    # and removed staff have records but no roster entry
+    rostered = roster.checked_in(counts)
+    not_checked_in = headcount - sum(rostered.values())
+    # Everyone with a record, plus rostered staff without one; without a
+    # roster, today's records
+    total_staff = counts.total + not_checked_in
+
+    # Count statuses; staff who never checked in are absent too
+    present = counts.statuses['Present'] + counts.statuses['Late'] + counts.statuses['Half Day']
+    late = counts.statuses['Late']
+    absent = counts.statuses['Absent'] + not_checked_in
+    departments = roster.departments()
+
+    # Calculate percentages
+    present_percentage = round((present / total_staff) * 100, 1) if total_staff > 0 else 0
+    late_percentage = round((late / total_staff) * 100, 1) if total_staff > 0 else 0
+    absent_percentage = round((absent / total_staff) * 100, 1) if total_staff > 0 else 0
+
+    return {
+        'success': True,
+        'total_staff': total_staff,
+        'checked_in': counts.total,
+        'not_checked_in': not_checked_in,
+        'present': present,
+        'late': late,
+        'absent': absent,
+        'present_percentage': present_percentage,
+        'late_percentage': late_percentage,
+        'absent_percentage': absent_percentage,
+        'departments': {d: n for d, n in counts.departments.items() if n},
+        'not_checked_in_by_department': {
+            d: n - rostered[d] for d, n in departments.items() if n > rostered[d]
         }
+    }
 
+ROLLUP_KINDS = ('department', 'staff')
+
+@app.route('/api/analytics')
+def attendance_analytics():
+    """Status counts, lateness and hours worked over a date range"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    date_from = request.args.get('from', today)
+    date_to = request.args.get('to', date_from)
+    kind = request.args.get('by', 'department')
+    start = request.args.get('start', '09:00')
+    try:
+        datetime.strptime(date_from, '%Y-%m-%d')
+        datetime.strptime(date_to, '%Y-%m-%d')
+        datetime.strptime(start, '%H:%M')
+    except ValueError:
+        return {'success': False, 'error': 'from and to must be YYYY-MM-DD and start HH:MM'}, 400
+    if kind not in ROLLUP_KINDS:
+        return {'success': False, 'error': 'by must be department or staff'}, 400
+
+    columns = analytics_columns.columns(date_from, date_to)
+    return {
+        'success': True,
+        'records': len(columns),
+        'status_counts': columns.status_counts(kind),
+        'lateness_minutes': columns.lateness(start),
+        'work_minutes': columns.work_minutes(kind)
+    }
+
+def rollup_row(key, statuses):
+    """Counts and percentages for one rollup key, shaped like /get_stats"""
+    total = sum(statuses.values())
+    present = statuses['Present'] + statuses['Late'] + statuses['Half Day']
+    row = {
+        'key': key,
+        'total': total,
+        'present': present,
+        'late': statuses['Late'],
+        'half_day': statuses['Half Day'],
+        'on_leave': statuses['On Leave'],
+        'absent': statuses['Absent']
+    }
+    for name in ('present', 'late', 'half_day', 'absent'):
+        row[f'{name}_percentage'] = round((row[name] / total) * 100, 1) if total > 0 else 0
+    return row
+
+@app.route('/api/rollups')
+def attendance_rollups():
+    """Month-to-date attendance rates per department or per staff member"""
+    month = request.args.get('month', datetime.now().strftime('%Y-%m'))
+    kind = request.args.get('by', 'department')
+    try:
+        datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return {'success': False, 'error': 'month must be YYYY-MM'}, 400
+    if kind not in ROLLUP_KINDS:
+        return {'success': False, 'error': 'by must be department or staff'}, 400
+
+    rollup = store.rollup(month, kind, request.args.get('key', '').strip() or None)
+    return {
+        'success': True,
+        'month': month,
+        'by': kind,
+        'rows': [rollup_row(key, statuses) for key, statuses in sorted(rollup.items())]
+    }
+
+@app.route('/api/staff/<staff_id>/summary')
+def staff_summary(staff_id):
+    """Last-30-day status counts, current streak and average check-in time for one staff member"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    summary = summaries.get(staff_id, today)
+    staff = roster.get(staff_id)
+    if staff is None and not summary['staff_name']:
+        return {'success': False, 'error': f'Staff ID {staff_id} is not on the roster and has no records'}, 404
+    if staff is not None:
+        # The roster has the current name and department
+        summary['staff_name'] = staff['staff_name']
+        summary['department'] = staff['department']
+    return {'success': True, **summary}
+
+@app.route('/get_stats')
+def get_stats():
+    """Get attendance statistics"""
+    try:
+        today = datetime.now().strftime('%Y-%m-%d')
+        stats = day_stats(today)
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
         }
 
+    # Unchanged polls get a 304 with no body
+    return conditional(jsonify(stats))
+
+@app.route('/stats_stream')
+def stats_stream():
+    """Push stats and changed records as server-sent events whenever today's attendance changes"""
+    if stream_slots is None or not stream_slots.acquire(blocking=False):
+        # EventSource gives up on an error status, and the page falls back to polling
+        return Response('Too many open streams', status=503, headers={'Retry-After': '30'})
+
+    def events():
+        # Tell the browser how long to wait before reconnecting
+        yield 'retry: 5000\n\n'
+        index = None
+        seen = 0
+        while True:
+            today = datetime.now().strftime('%Y-%m-%d')
+            counts = store.counts(today)
+
+            if counts is not index:
+                # First message, a new day, or the day was reloaded after
+                # another worker wrote: the client refetches the whole table
+                payload = {'stats': day_stats(today), 'records': [], 'reset': index is not None}
+                index, seen = counts, len(counts.changes)
+            elif len(counts.changes) > seen:
+                changed = {r['staff_id']: r.to_dict() for r in counts.changes[seen:]}
+                payload = {'stats': day_stats(today), 'records': list(changed.values()), 'reset': False}
+                seen = len(counts.changes)
+            else:
+                payload = None
+
+            if payload:
+                yield f'data: {json.dumps(payload)}\n\n'
+            else:
+                # Keep-alive comment, also notices closed connections
+                yield ': \n\n'
+
+            # Woken at once by commits in this worker; other workers' commits
+            # are picked up by the next check
+            store.wait_for_change(STREAM_CHECK_INTERVAL)
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the client goes away, even if the stream never started
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups():
+    """Recount the monthly rollups from the raw attendance records"""
+    counted = store.rebuild_rollups()
+    click.echo(f'Rebuilt rollups from {counted} records')
+
+@app.cli.command('migrate-sqlite')
+@click.argument('json_file', default=ATTENDANCE_FILE)
+@click.argument('db_file', default=ATTENDANCE_DB)
+def migrate_sqlite(json_file, db_file):
+    """Import a JSON attendance file into an SQLite database"""
+    imported = SQLiteAttendanceStore(db_file).import_data(read_json(json_file))
+    click.echo(f'Imported {imported} records from {json_file} into {db_file}')
+
+@app.cli.command('import-staff')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8'), required=False)
+@click.option('--replace', is_flag=True, help='Overwrite names and departments of staff already on the roster')
+def import_staff(csv_file, replace):
+    """Add staff from a CSV with staff_id, staff_name and department columns
+
+    Without a file, the roster is built from the attendance history, using
+    each staff member's latest name and department.
+    """
+    if csv_file:
+        entries = [row for row in csv.DictReader(csv_file) if all(row.get(field) for field in StaffRoster.FIELDS)]
+    else:
+        latest = {}
+        for record in store.query('', '\uffff'):
+            latest[record['staff_id']] = {field: record.get(field, '') for field in StaffRoster.FIELDS}
+        entries = latest.values()
+    added = roster.add_many(entries, replace=replace)
+    click.echo(f'Added or updated {added} staff; {roster.headcount()} on the roster')
+
+@app.cli.command('remove-staff')
+@click.argument('staff_id')
+def remove_staff(staff_id):
+    """Take a staff member who has left off the roster"""
+    if roster.remove(staff_id):
+        click.echo(f'Removed {staff_id} from the roster')
+    else:
+        click.echo(f'{staff_id} is not on the roster')
+
+@app.cli.command('export-json')
+@click.argument('output', type=click.File('wb'), default='-')
+def export_json(output):
+    """Write all attendance as indented, human-readable JSON (stdout by default)"""
+    data = store.data()
+    output.write(codec.pretty({date: data[date] for date in sorted(data)}))
+    output.write(b'\n')
+
+IMPORT_BATCH_SIZE = 50000
+
+# Every valid 'HH:MM', so a million imported rows need no strptime
+CLOCK_TIMES = frozenset(f'{hour:02d}:{minute:02d}' for hour in range(24) for minute in range(60))
+
+@lru_cache(maxsize=4096)
+def valid_date(text):
+    try:
+        datetime.strptime(text, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
+
+def parse_import_row(row, staff, new_staff):
+    """Turn one imported record into a check-in event, return (event, error)
+
+    staff is the roster by ID; the row's own name and department are kept
+    when given, since they were true on that date.
+    """
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+
+    fields = {name: str(row.get(name) or '').strip() for name in RECORD_FIELDS}
+    # Same required fields as the form
+    if not fields['staff_id'] or not fields['status']:
+        return None, 'Please fill all fields'
+    if not valid_date(fields['date']):
+        return None, 'date must be YYYY-MM-DD'
+    if fields['checkin_time'] not in CLOCK_TIMES:
+        return None, 'checkin_time must be HH:MM'
+    if fields['checkout_time'] in ('', '--:--'):
+        fields['checkout_time'] = '--:--'
+    elif fields['checkout_time'] not in CLOCK_TIMES:
+        return None, 'checkout_time must be HH:MM or --:--'
+
+    known = staff.get(fields['staff_id']) or new_staff.get(fields['staff_id'])
+    if known is None:
+        if not (fields['staff_name'] and fields['department']):
+            return None, 'Staff ID is not on the roster; give staff_name and department to add them'
+        known = new_staff[fields['staff_id']] = {name: fields[name] for name in StaffRoster.FIELDS}
+    fields['staff_name'] = fields['staff_name'] or known['staff_name']
+    fields['department'] = fields['department'] or known['department']
+    return {'op': 'checkin', 'record': fields}, None
+
+def file_format(path, given):
+    if given:
+        return given
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+def read_rows(file, input_format):
+    """Yield (line number, row, parse error) from a CSV or NDJSON file, one line at a time"""
+    if input_format == 'csv':
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield number, codec.loads(line), None
+            except codec.DecodeError as e:
+                yield number, None, f'Invalid JSON: {e}'
+
+@app.cli.command('import-attendance')
+@click.argument('input_file', type=click.File('rb'))
+@click.option('--format', 'input_format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to csv for .csv files, ndjson otherwise')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Records per write')
+def import_attendance(input_file, input_format, batch_size):
+    """Stream attendance records from CSV or NDJSON into the store
+
+    Rows have the export's columns (date, staff_id, staff_name, department,
+    status, checkin_time, checkout_time) and are checked like form
+    check-ins. Records already stored for that staff member and date are
+    skipped as duplicates.
+    """
+    input_format = file_format(input_file.name, input_format)
+    staff = {entry['staff_id']: entry for entry in roster.all()}
+    outcomes = {'accepted': 0, 'duplicate': 0, 'invalid': 0}
+    errors_shown = 0
+    rows = 0
+    started = time.perf_counter()
+
+    def flush(events, new_staff):
+        roster.add_many(new_staff.values())
+        staff.update(new_staff)
+        for outcome in store.apply(events):
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        # History is written; keep memory flat for the next batch
+        store.release({event['record']['date'] for event in events} - {datetime.now().strftime('%Y-%m-%d')})
+        elapsed = time.perf_counter() - started
+        click.echo(f'{rows:,} rows, {rows / elapsed:,.0f} rows/s', err=True)
+
+    events = []
+    new_staff = {}
+    for number, row, error in read_rows(input_file, input_format):
+        rows += 1
+        if not error:
+            event, error = parse_import_row(row, staff, new_staff)
+        if error:
+            outcomes['invalid'] += 1
+            if errors_shown < 10:
+                click.echo(f'line {number}: {error}', err=True)
+                errors_shown += 1
+            continue
+        events.append(event)
+        if len(events) >= batch_size:
+            flush(events, new_staff)
+            events = []
+            new_staff = {}
+    if events or new_staff:
+        flush(events, new_staff)
+
+    elapsed = time.perf_counter() - started
+    summary = ', '.join(f'{count:,} {outcome}' for outcome, count in outcomes.items() if count)
+    click.echo(f'Read {rows:,} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s): {summary or "nothing to import"}')
+
+@app.cli.command('export-attendance')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to csv for .csv files, ndjson otherwise')
+@click.option('--from', 'date_from', default='', help='First date, YYYY-MM-DD')
+@click.option('--to', 'date_to', default='\uffff', help='Last date, YYYY-MM-DD')
+def export_attendance(output, output_format, date_from, date_to):
+    """Stream attendance records to CSV or NDJSON (stdout by default)"""
+    output_format = file_format(output.name, output_format)
+    lines = csv_lines if output_format == 'csv' else ndjson_lines
+    rows = 0
+    started = time.perf_counter()
+
+    def records():
+        nonlocal rows
+        for record in store.query(date_from, date_to):
+            rows += 1
+            yield record
+
+    for chunk in chunked(lines(records())):
+        output.write(chunk)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Wrote {rows:,} records in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)', err=True)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
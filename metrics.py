@@ -0,0 +1,130 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a cached page render up to a slow fsync under contention
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    """A Prometheus counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+
+class Histogram:
+    """A Prometheus histogram, of durations in seconds by default, with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = len(self.buckets)
+        for n, bound in enumerate(self.buckets):
+            if value <= bound:
+                slot = n
+                break
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [0] * (len(self.buckets) + 2)
+            values[slot] += 1
+            values[-1] += value
+
+    def count(self, *labels):
+        """Number of observations with these labels"""
+        with self._lock:
+            values = self._values.get(labels)
+            return sum(values[:-1]) if values else 0
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe how long the with block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            values = {labels: list(counts) for labels, counts in self._values.items()}
+        for labels, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.label_names, labels, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {counts[-1]}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}'
+
+
+REQUEST_SECONDS = Histogram(
+    'attendance_request_seconds', 'Request latency by route', ('route', 'method')
+)
+STORAGE_SECONDS = Histogram(
+    'attendance_storage_seconds', 'Time spent loading and saving attendance data', ('operation',)
+)
+STORAGE_BYTES = Counter(
+    'attendance_storage_bytes_total', 'Bytes read and written by attendance storage', ('operation',)
+)
+RENDER_SECONDS = Histogram(
+    'attendance_render_seconds', 'Time spent building HTML', ('what',)
+)
+GROUP_COMMIT_EVENTS = Histogram(
+    'attendance_group_commit_events', 'Events written together by one group commit', (),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+SLOW_PROFILES = Counter(
+    'attendance_slow_request_profiles_total', 'cProfile dumps written for slow requests'
+)
+SUMMARY_LOOKUPS = Counter(
+    'attendance_staff_summary_lookups_total', 'Staff summary lookups served from the cache or built', ('result',)
+)
+
+METRICS = (
+    REQUEST_SECONDS, STORAGE_SECONDS, STORAGE_BYTES, RENDER_SECONDS, GROUP_COMMIT_EVENTS, SLOW_PROFILES,
+    SUMMARY_LOOKUPS
+)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,135 @@
+import sys
+
+EMPTY_TIME = '--:--'
+MISSING = -1
+
+# One shared int object per minute of the day; ints above 256 are otherwise
+# allocated afresh for every record
+_MINUTES = list(range(MISSING, 24 * 60))
+
+
+def minute_of_day(value):
+    """Turn 'HH:MM' into minutes since midnight, or MISSING for '--:--'"""
+    try:
+        return int(value[:2]) * 60 + int(value[3:5])
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def format_minutes(minutes):
+    """Turn minutes since midnight back into 'HH:MM'"""
+    if minutes == MISSING:
+        return EMPTY_TIME
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+# 'HH:MM' (and '--:--') to its shared minute int, and back
+_TIMES = {format_minutes(minutes): minutes for minutes in _MINUTES}
+_TEXTS = [format_minutes(minutes) for minutes in _MINUTES]
+
+
+def compact_time(value):
+    """Store a time as a shared minute int, keeping any text that would not round-trip"""
+    minutes = _TIMES.get(value)
+    if minutes is None:
+        return sys.intern(str(value))
+    return minutes
+
+
+class Record:
+    """One attendance record, stored compactly
+
+    Strings are interned, so a department, status, date or returning
+    staff member costs one pointer per record, and times are kept as
+    shared minute-of-day ints. Reading it like the JSON dict
+    (record['checkin_time'], record.get(...)) returns the same values,
+    and to_dict()/from_dict() round-trip the JSON shape.
+    """
+
+    __slots__ = ('staff_id', 'staff_name', 'department', 'status', 'checkin', 'checkout', 'date')
+
+    FIELDS = ('staff_id', 'staff_name', 'department', 'status', 'checkin_time', 'checkout_time', 'date')
+
+    def __init__(self, staff_id, staff_name, department, status, checkin_time, checkout_time, date):
+        self.staff_id = sys.intern(staff_id)
+        self.staff_name = sys.intern(staff_name)
+        self.department = sys.intern(department)
+        self.status = sys.intern(status)
+        self.checkin = compact_time(checkin_time)
+        self.checkout = compact_time(checkout_time)
+        self.date = sys.intern(date)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from the JSON shape"""
+        if isinstance(data, cls):
+            return data
+        return cls(
+            str(data.get('staff_id', '')),
+            str(data.get('staff_name', '')),
+            str(data.get('department', '')),
+            str(data.get('status', '')),
+            data.get('checkin_time', EMPTY_TIME),
+            data.get('checkout_time', EMPTY_TIME),
+            str(data.get('date', ''))
+        )
+
+    def to_dict(self):
+        """Return the record in the JSON shape"""
+        return {
+            'staff_id': self.staff_id,
+            'staff_name': self.staff_name,
+            'department': self.department,
+            'status': self.status,
+            'checkin_time': self._time(self.checkin),
+            'checkout_time': self._time(self.checkout),
+            'date': self.date
+        }
+
+    def __getitem__(self, key):
+        if key == 'checkin_time':
+            return self._time(self.checkin)
+        if key == 'checkout_time':
+            return self._time(self.checkout)
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'checkin_time':
+            self.checkin = compact_time(value)
+        elif key == 'checkout_time':
+            self.checkout = compact_time(value)
+        elif key in self.__slots__:
+            setattr(self, key, sys.intern(value))
+        else:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    @staticmethod
+    def _time(value):
+        return _TEXTS[value + 1] if isinstance(value, int) else value
+
+    def __repr__(self):
+        return f'Record({self.to_dict()!r})'
+
+
+def encode_record(obj):
+    """json.dump default= hook that writes records in the JSON shape"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def records_from_json(data):
+    """Turn {date: [record dict, ...]} into {date: [Record, ...]}"""
+    return {date: [Record.from_dict(record) for record in records] for date, records in data.items()}
@@ -0,0 +1,249 @@
+// Update current date and time
+function updateDateTime() {
+    const now = new Date();
+    const options = { 
+        weekday: 'long', 
+        year: 'numeric', 
+        month: 'long', 
+        day: 'numeric',
+        hour: '2-digit',
+        minute: '2-digit',
+        second: '2-digit'
+    };
+    document.getElementById('currentDateTime').textContent = 
+        '📅 ' + now.toLocaleDateString('en-US', options);
+}
+
+// Render stats
+function renderStats(data) {
+    const statsBox = document.getElementById('statsSection');
+    statsBox.innerHTML = `
+        <div class="stat-card">
+            <div>👥 Total Staff</div>
+            <div class="stat-number">${data.total_staff}</div>
+            <div>${data.checked_in} checked in</div>
+        </div>
+        <div class="stat-card">
+            <div>✅ Present</div>
+            <div class="stat-number">${data.present}</div>
+            <div>${data.present_percentage}%</div>
+        </div>
+        <div class="stat-card">
+            <div>⏰ Late</div>
+            <div class="stat-number">${data.late}</div>
+            <div>${data.late_percentage}%</div>
+        </div>
+        <div class="stat-card">
+            <div>❌ Absent</div>
+            <div class="stat-number">${data.absent}</div>
+            <div>${data.absent_percentage}%</div>
+        </div>
+    `;
+}
+
+// Update stats
+async function updateStats() {
+    try {
+        const response = await fetch('/get_stats');
+        const data = await response.json();
+
+        if (data.success) {
+            renderStats(data);
+        }
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
+}
+
+const STATUS_CLASSES = {
+    'Present': 'status-present',
+    'Late': 'status-present',
+    'Half Day': 'status-present',
+    'On Leave': 'status-onleave',
+    'Absent': 'status-absent'
+};
+
+// Reload the attendance table from the server
+async function refreshTable() {
+    try {
+        const response = await fetch('/');
+        const page = new DOMParser().parseFromString(await response.text(), 'text/html');
+        document.getElementById('attendanceTable').innerHTML =
+            page.getElementById('attendanceTable').innerHTML;
+    } catch (error) {
+        console.error('Error loading attendance table:', error);
+    }
+}
+
+// Add a record to the table, or update its row if it is already there
+function upsertRow(record) {
+    const tbody = document.querySelector('#attendanceTable tbody');
+    if (!tbody) {
+        // Still showing the empty state
+        refreshTable();
+        return;
+    }
+
+    let row = tbody.querySelector(`tr[data-staff-id="${CSS.escape(record.staff_id)}"]`);
+    if (!row) {
+        if (document.getElementById('loadMore')) {
+            // Not all pages are loaded; a new check-in comes with a later one
+            return;
+        }
+        row = document.createElement('tr');
+        row.dataset.staffId = record.staff_id;
+        tbody.appendChild(row);
+    }
+
+    row.innerHTML = '';
+    for (const field of ['staff_id', 'staff_name', 'department', 'checkin_time', 'checkout_time']) {
+        const cell = document.createElement('td');
+        cell.textContent = record[field];
+        row.appendChild(cell);
+    }
+    const status = document.createElement('span');
+    status.className = STATUS_CLASSES[record.status] || '';
+    status.textContent = record.status;
+    const statusCell = document.createElement('td');
+    statusCell.appendChild(status);
+    row.appendChild(statusCell);
+}
+
+// Fetch the next page of today's records and append it to the table
+async function loadMore(button) {
+    button.disabled = true;
+    try {
+        const params = new URLSearchParams({cursor: button.dataset.cursor, limit: 100});
+        const response = await fetch(`/api/attendance/today?${params}`);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error);
+        }
+        // Remove the button first, so upsertRow appends
+        button.remove();
+        data.records.forEach(upsertRow);
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            const shown = document.querySelectorAll('#attendanceTable tbody tr').length;
+            document.getElementById('attendanceTable').appendChild(button);
+            document.getElementById('remaining').textContent = Math.max(data.total - shown, 0);
+        }
+    } catch (error) {
+        console.error('Error loading more records:', error);
+    } finally {
+        button.disabled = false;
+    }
+}
+
+document.getElementById('attendanceTable').addEventListener('click', function(e) {
+    const button = e.target.closest('#loadMore');
+    if (button) {
+        loadMore(button);
+    }
+});
+
+// Receive stats and changed records as they happen; poll when that is not possible
+let pollTimer = null;
+
+function startPolling() {
+    if (!pollTimer) {
+        // Update stats every 30 seconds
+        pollTimer = setInterval(updateStats, 30000);
+    }
+}
+
+function startStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    const source = new EventSource('/stats_stream');
+    source.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+        if (data.stats.success) {
+            renderStats(data.stats);
+        }
+        if (data.reset) {
+            refreshTable();
+        } else {
+            data.records.forEach(upsertRow);
+        }
+    };
+    source.onerror = function() {
+        // The browser retries on its own; poll only once it gives up
+        if (source.readyState === EventSource.CLOSED) {
+            startPolling();
+        }
+    };
+}
+
+// Show message
+function showMessage(text, type) {
+    const messageDiv = document.getElementById('message');
+    messageDiv.textContent = text;
+    messageDiv.className = `message ${type}`;
+
+    // Auto-hide after 5 seconds
+    setTimeout(() => {
+        messageDiv.style.display = 'none';
+    }, 5000);
+}
+
+// Handle form submission
+document.getElementById('attendanceForm').addEventListener('submit', async function(e) {
+    e.preventDefault();
+
+    const formData = new FormData(this);
+    const action = formData.get('action');
+
+    try {
+        const response = await fetch('/mark_attendance', {
+            method: 'POST',
+            body: formData
+        });
+
+        const result = await response.text();
+
+        // Check if response contains success message
+        if (result.includes('success')) {
+            const match = result.match(/message=(.*?)&type=(.*?)'/);
+            if (match) {
+                const message = decodeURIComponent(match[1]);
+                const type = match[2];
+                showMessage(message, type);
+
+                // Refresh page after 2 seconds
+                setTimeout(() => {
+                    location.reload();
+                }, 2000);
+            }
+        } else {
+            showMessage('❌ Error processing attendance!', 'error');
+        }
+    } catch (error) {
+        showMessage('❌ Network error! Please try again.', 'error');
+        console.error('Error:', error);
+    }
+});
+
+// Load stats when page loads
+window.onload = function() {
+    updateDateTime();
+    updateStats();
+
+    // Update time every second
+    setInterval(updateDateTime, 1000);
+
+    // Push stats as check-ins happen
+    startStream();
+
+    // Show message from URL parameters
+    const urlParams = new URLSearchParams(window.location.search);
+    const message = urlParams.get('message');
+    const messageType = urlParams.get('type');
+
+    if (message) {
+        showMessage(decodeURIComponent(message), messageType);
+    }
+};
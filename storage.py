@@ -0,0 +1,1471 @@
+import fcntl
+import itertools
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+
+import codec
+from metrics import GROUP_COMMIT_EVENTS, STORAGE_BYTES, STORAGE_SECONDS
+from records import EMPTY_TIME, Record, minute_of_day, records_from_json
+
+logger = logging.getLogger(__name__)
+
+# Shared by every DayIndex, so a rebuilt index never reuses an old version
+_versions = itertools.count(1)
+# Day digests are sums of record hashes, kept to 64 bits
+DIGEST_MASK = (1 << 64) - 1
+
+
+class DayIndex:
+    """staff_id lookup and running status/department counts for one day's records
+
+    version changes whenever the day's records change, so it can key
+    anything derived from them. changes lists every record added or
+    changed since the index was built, oldest first.
+
+    page() walks the records in check-in time order. The sorted lists
+    behind it are built on first use (per department and per status when
+    filtered on, for values some record has) and kept sorted as records
+    are added.
+    """
+
+    def __init__(self, records=()):
+        self.version = next(_versions)
+        self.by_staff = {}
+        self.total = 0
+        self.statuses = Counter()
+        self.departments = Counter()
+        self.changes = []
+        self._records = []
+        # (field, value) or None -> sorted [(checkin minute, position, record), ...]
+        self._order = {}
+        for record in records:
+            self.add(record)
+        self.changes.clear()
+
+    def add(self, record):
+        """Index a record appended to the day"""
+        # Keep the first record for a staff_id, like a scan of the list would
+        self.by_staff.setdefault(record['staff_id'], record)
+        if self._order:
+            entry = (minute_of_day(record.get('checkin_time')), len(self._records), record)
+            for key, order in self._order.items():
+                if key is None or record.get(key[0]) == key[1]:
+                    insort(order, entry)
+        self._records.append(record)
+        self._count(record, 1)
+        self.changes.append(record)
+
+    def update(self, record, fields):
+        """Change fields of an indexed record, keeping the counts in step"""
+        self._count(record, -1)
+        record.update(fields)
+        self._count(record, 1)
+        self.changes.append(record)
+
+    def page(self, after=None, limit=100, descending=False, department=None, status=None):
+        """Return (records, total matching, key of the last record if more follow) in check-in order
+
+        after is the key returned with the previous page. Keys are
+        (check-in minute, position), so records added since still land on
+        the right side of it.
+        """
+        filters = [(field, value) for field, value in (('department', department), ('status', status)) if value]
+        counts = {'department': self.departments, 'status': self.statuses}
+        if any(counts[field][value] <= 0 for field, value in filters):
+            # Nothing matches, and a value nobody has must not get a sorted list
+            # that every later add() keeps up to date
+            return [], 0, None
+        order = self._sorted(filters[0] if filters else None)
+        rest = filters[1:]
+
+        if descending:
+            end = bisect_left(order, after) if after else len(order)
+            candidates = (order[n] for n in range(end - 1, -1, -1))
+        else:
+            # The first key greater than after; positions are whole numbers
+            start = bisect_left(order, (after[0], after[1] + 1)) if after else 0
+            candidates = (order[n] for n in range(start, len(order)))
+
+        page = []
+        more = False
+        for minute, position, record in candidates:
+            if any(record.get(field) != value for field, value in rest):
+                continue
+            if len(page) == limit:
+                more = True
+                break
+            page.append((minute, position, record))
+
+        if rest:
+            total = sum(1 for entry in order if all(entry[2].get(field) == value for field, value in rest))
+        else:
+            total = len(order)
+        next_key = page[-1][:2] if more and page else None
+        return [record for _, _, record in page], total, next_key
+
+    def _sorted(self, key):
+        order = self._order.get(key)
+        if order is None:
+            order = sorted(
+                (minute_of_day(record.get('checkin_time')), position, record)
+                for position, record in enumerate(self._records)
+                if key is None or record.get(key[0]) == key[1]
+            )
+            self._order[key] = order
+        return order
+
+    def _count(self, record, n):
+        self.version = next(_versions)
+        self.total += n
+        self.statuses[record.get('status', '')] += n
+        self.departments[record.get('department', '')] += n
+
+
+def record_hash(record):
+    """Hash a record's contents; a day's digest is the sum of its records' hashes"""
+    return hash((record.staff_id, record.staff_name, record.department, record.status, record.checkin, record.checkout))
+
+
+def day_digest(records):
+    """Return a digest of a day's records that can be kept up to date one record at a time"""
+    return sum(map(record_hash, records)) & DIGEST_MASK
+
+
+def apply_event(data, event, index=None):
+    """Apply one checkin/checkout event to attendance data, return the outcome
+
+    index is the DayIndex for the event's date; it is built from data when
+    not given and kept in step with any change made.
+    """
+    date = event_date(event)
+    if index is None:
+        index = DayIndex(data.get(date, []))
+
+    if event['op'] == 'checkin':
+        if event['record']['staff_id'] in index.by_staff:
+            return 'duplicate'
+        record = Record.from_dict(event['record'])
+        data.setdefault(date, []).append(record)
+        index.add(record)
+        return 'accepted'
+
+    if event['op'] == 'checkout':
+        existing = index.by_staff.get(event['staff_id'])
+        if existing is None:
+            return 'not_checked_in'
+        if existing['checkout_time'] != EMPTY_TIME:
+            return 'already_checked_out'
+        index.update(existing, {'checkout_time': event['time']})
+        return 'accepted'
+
+    raise ValueError(f"Unknown attendance event: {event['op']!r}")
+
+
+class PendingWrite:
+    """Events queued for the group-commit flusher, and their result once durable"""
+
+    def __init__(self, events):
+        self.events = events
+        self.outcomes = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def event_date(event):
+    """Return the attendance date an event applies to"""
+    if event['op'] == 'checkin':
+        return event['record']['date']
+    return event['date']
+
+
+def read_json(path):
+    """Read a JSON file, returning {} if it does not exist"""
+    if not os.path.exists(path):
+        return {}
+    with STORAGE_SECONDS.time('load'):
+        with open(path, 'rb') as f:
+            content = f.read()
+        data = codec.loads(content)
+    STORAGE_BYTES.inc(len(content), 'load')
+    return data
+
+
+def write_json_atomic(path, data, pretty=False):
+    """Write JSON to a temp file, fsync it and rename it over path"""
+    tmp_path = f'{path}.tmp'
+    with STORAGE_SECONDS.time('save'):
+        content = codec.pretty(data) if pretty else codec.dumps(data)
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    STORAGE_BYTES.inc(len(content), 'save')
+
+
+def file_signature(path):
+    """Return (inode, mtime, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # The inode changes on every atomic replace, even within one mtime tick
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class FileLock:
+    """Exclusive lock held across threads and every process sharing the lock file
+
+    Reentrant within a process, so a write that calls save() while already
+    holding the lock does not deadlock on its own flock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class SQLiteConnection:
+    """One connection per process to an SQLite database in WAL mode
+
+    Calling it returns the connection, opening it on first use. A
+    connection must not cross a fork, so a preloaded app reconnects.
+    """
+
+    TIMEOUT = 30
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._conn = None
+        self._pid = None
+
+    def __call__(self):
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.TIMEOUT, isolation_level=None, check_same_thread=False)
+            self._enable_wal(conn)
+            conn.executescript(self.schema)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _enable_wal(self, conn):
+        """Switch to WAL, retrying while workers open a new database at the same moment"""
+        # The busy timeout does not cover changing the journal mode
+        deadline = time.monotonic() + self.TIMEOUT
+        while True:
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+
+class Rollups:
+    """Month-to-date status counts per department and per staff member
+
+    Rows are keyed by (month, kind, key, status), where kind is
+    'department' or 'staff', and are bumped for every accepted check-in,
+    so a monthly report reads a handful of rows instead of every record.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS attendance_rollup (
+            month TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (month, kind, key, status)
+        ) WITHOUT ROWID;
+    '''
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def _transaction(self, work):
+        """Run work(conn), joining the caller's transaction if one is open"""
+        conn = self._connection()
+        if conn.in_transaction:
+            return work(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = work(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def _add(self, conn, records):
+        # Sum in memory first: a large batch bumps each row once, not once per record
+        counts = Counter()
+        for record in records:
+            month = record['date'][:7]
+            status = record.get('status', '')
+            counts[month, 'department', record.get('department', ''), status] += 1
+            counts[month, 'staff', record['staff_id'], status] += 1
+        conn.executemany(
+            '''INSERT INTO attendance_rollup (month, kind, key, status, count) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (month, kind, key, status) DO UPDATE SET count = count + excluded.count''',
+            [(*row, count) for row, count in counts.items()],
+        )
+
+    def add(self, records):
+        """Count newly checked-in records"""
+        self._transaction(lambda conn: self._add(conn, records))
+
+    def rebuild(self, records):
+        """Replace every rollup with counts of records, return how many were counted"""
+        def replace(conn):
+            conn.execute('DELETE FROM attendance_rollup')
+            counted = 0
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= 10000:
+                    self._add(conn, batch)
+                    counted += len(batch)
+                    batch = []
+            self._add(conn, batch)
+            return counted + len(batch)
+
+        return self._transaction(replace)
+
+    def is_empty(self):
+        return self._connection().execute('SELECT 1 FROM attendance_rollup LIMIT 1').fetchone() is None
+
+    def query(self, month, kind, key=None):
+        """Return {key: Counter of statuses} for one month"""
+        sql = 'SELECT key, status, count FROM attendance_rollup WHERE month = ? AND kind = ?'
+        params = [month, kind]
+        if key:
+            sql += ' AND key = ?'
+            params.append(key)
+        result = {}
+        for row_key, status, count in self._connection().execute(sql, params):
+            result.setdefault(row_key, Counter())[status] += count
+        return result
+
+
+class StaffRoster:
+    """Staff members by ID, cached in memory from a JSON file
+
+    Check-ins take the name and department from here instead of from
+    whatever was typed with each one. The names and departments are
+    interned, so every record of a staff member shares them. Headcounts
+    per department are kept in step with every change, and so are the
+    rostered check-ins of one day (see checked_in()), so absentee stats
+    never walk the roster or the day's records.
+    """
+
+    FIELDS = ('staff_id', 'staff_name', 'department')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._write_lock = FileLock(f'{path}.lock')
+        self._staff = {}
+        self._departments = Counter()
+        self._signature = None
+        # (DayIndex, len(changes) seen, staff IDs counted, Counter by department)
+        self._checked_in = None
+        self.reload()
+
+    def reload(self):
+        """Read the whole roster file into memory"""
+        with self._lock:
+            self._signature = file_signature(self.path)
+            self._staff = {}
+            self._departments = Counter()
+            for entry in read_json(self.path) or []:
+                self._put(entry)
+
+    def refresh(self):
+        """Reload only if another process changed the roster file"""
+        with self._lock:
+            if file_signature(self.path) != self._signature:
+                self.reload()
+
+    def get(self, staff_id):
+        """Return the roster entry for staff_id, or None"""
+        with self._lock:
+            self.refresh()
+            return self._staff.get(staff_id)
+
+    def all(self):
+        """Return every roster entry"""
+        with self._lock:
+            self.refresh()
+            return list(self._staff.values())
+
+    def headcount(self):
+        """Return the number of staff on the roster"""
+        with self._lock:
+            self.refresh()
+            return len(self._staff)
+
+    def departments(self):
+        """Return a Counter of staff per department"""
+        with self._lock:
+            self.refresh()
+            return +self._departments
+
+    def checked_in(self, index):
+        """Return a Counter, by roster department, of staff on the roster with a record in a DayIndex
+
+        Records of staff not on the roster (checked in before it existed,
+        or removed since) are left out. The last day asked for is kept and
+        brought up to date from index.changes, and counted again only when
+        the index or the roster is replaced or changed.
+        """
+        with self._lock:
+            self.refresh()
+            # Read first: records added meanwhile are in by_staff and after end,
+            # and counted once either way
+            end = len(index.changes)
+            if self._checked_in is not None and self._checked_in[0] is index:
+                _, seen, counted, departments = self._checked_in
+                records = index.changes[seen:end]
+            else:
+                # by_staff holds every record, including those in changes
+                counted, departments = set(), Counter()
+                records = list(index.by_staff.values())
+            for record in records:
+                entry = self._staff.get(record['staff_id'])
+                if entry is not None and entry['staff_id'] not in counted:
+                    counted.add(entry['staff_id'])
+                    departments[entry['department']] += 1
+            self._checked_in = (index, end, counted, departments)
+            return +departments
+
+    def add(self, staff_id, staff_name, department):
+        """Add a staff member unless the ID is taken, return the roster entry"""
+        with self._write_lock, self._lock:
+            self.refresh()
+            entry = self._staff.get(staff_id)
+            if entry is None:
+                entry = self._put({'staff_id': staff_id, 'staff_name': staff_name, 'department': department})
+                self._write()
+            return entry
+
+    def add_many(self, entries, replace=False):
+        """Add staff members in one write, return how many were added or changed
+
+        Existing IDs are skipped unless replace is set.
+        """
+        with self._write_lock, self._lock:
+            self.refresh()
+            changed = 0
+            for entry in entries:
+                existing = self._staff.get(entry['staff_id'])
+                if existing is not None and (not replace or all(existing[f] == entry[f] for f in self.FIELDS)):
+                    continue
+                self._put(entry)
+                changed += 1
+            if changed:
+                self._write()
+            return changed
+
+    def remove(self, staff_id):
+        """Take a staff member off the roster, return whether they were on it"""
+        with self._write_lock, self._lock:
+            self.refresh()
+            entry = self._staff.pop(staff_id, None)
+            if entry is None:
+                return False
+            self._departments[entry['department']] -= 1
+            self._checked_in = None
+            self._write()
+            return True
+
+    def _put(self, entry):
+        entry = {field: sys.intern(str(entry[field])) for field in self.FIELDS}
+        self._checked_in = None
+        old = self._staff.get(entry['staff_id'])
+        if old is not None:
+            self._departments[old['department']] -= 1
+        self._staff[entry['staff_id']] = entry
+        self._departments[entry['department']] += 1
+        return entry
+
+    def _write(self):
+        write_json_atomic(self.path, list(self._staff.values()))
+        self._signature = file_signature(self.path)
+
+
+class AttendanceStore:
+    """Attendance data kept in memory and written through to a JSON file
+
+    Writes hold a file lock shared by all worker processes and re-read any
+    change another worker made before applying their own, so concurrent
+    check-ins are never lost. Files are replaced atomically, so readers
+    never need the lock.
+
+    This is also the storage interface: other layouts subclass it and
+    override reload(), refresh(), _refresh_day(), save() and _persist()
+    (or _commit()), while the routes only use data(), day(), counts(),
+    checkin(), checkout() and apply(). open_store() picks one by name.
+
+    When rollups is given, every accepted check-in is also counted there
+    while the write lock is still held.
+
+    After start_group_commit(), apply() queues its events for a flusher
+    thread that commits everything queued within a short window as one
+    write, and returns once that write is durable.
+
+    Every write of the file also writes a small startup file beside it
+    with the latest day's records and the list of dates. When it matches
+    the file, startup reads only that and older days are read on first
+    use, so a cold start does not parse the whole history.
+    """
+
+    # Seconds apply() waits for the flusher before giving up
+    GROUP_COMMIT_TIMEOUT = 30
+
+    def __init__(self, path, rollups=None):
+        self.path = path
+        self.rollups = rollups
+        self._lock = threading.RLock()
+        self._write_lock = FileLock(self._lock_path())
+        self._changed = threading.Condition()
+        self._pending = []
+        self._pending_changed = threading.Condition()
+        self._flusher = None
+        self._flusher_pid = None
+        self._flusher_window = None
+        self._flusher_start = threading.Lock()
+        self._data = {}
+        self._indexes = {}
+        self._signature = None
+        # Dates on disk that reload() left unread
+        self._unloaded = set()
+        # date -> day_digest() of its loaded records, see day_version()
+        self._digests = {}
+        # Set when counting a durable write into the rollups failed
+        self._rollups_stale = False
+        self.reload()
+        if self._startup_file_stale():
+            with self._write_lock, self._lock:
+                self.refresh()
+                if self._startup_file_stale():
+                    self._write_startup_file()
+
+    def _lock_path(self):
+        return f'{self.path}.lock'
+
+    def _startup_path(self):
+        return f'{os.path.splitext(self.path)[0]}.startup.json'
+
+    def _stat(self, path=None):
+        return file_signature(path or self.path)
+
+    def reload(self, history=False):
+        """Read the file into memory, or only its latest day if the startup file matches it"""
+        with self._lock:
+            self._signature = self._stat()
+            self._indexes = {}
+            startup = None if history else self._read_startup_file()
+            if startup is not None:
+                date = startup['date']
+                self._data = records_from_json({date: startup['records']}) if date else {}
+                self._unloaded = set(startup['dates']) - {date}
+            else:
+                # A corrupt file raises instead of being treated as empty, so the
+                # next write can never replace the history with today's records
+                self._data = records_from_json(read_json(self.path))
+                self._unloaded = set()
+            self._reset_digests()
+
+    def _read_startup_file(self):
+        """Return the startup file if it was written for the current file, else None"""
+        if self._signature is None:
+            return None
+        try:
+            startup = read_json(self._startup_path())
+        except (OSError, codec.DecodeError):
+            # Only a shortcut; the file itself is still there to read
+            return None
+        if startup.get('source') != list(self._signature):
+            return None
+        return startup
+
+    def _startup_file_stale(self):
+        """Whether the file has history but no matching startup file"""
+        return not self._unloaded and self._signature is not None and self._read_startup_file() is None
+
+    def _write_startup_file(self):
+        """Write the latest day and the list of dates for the next start to begin from"""
+        dates = sorted(self._data)
+        date = dates[-1] if dates else None
+        try:
+            write_json_atomic(self._startup_path(), {
+                # With the inode: a rewrite can keep the size (a check-out) and, on a
+                # coarse-mtime filesystem, the mtime too, and a worker that reloads
+                # between the two writes must not take the old startup file as current
+                'source': list(self._signature),
+                'dates': dates,
+                'date': date,
+                'records': self._data.get(date, []),
+            })
+        except Exception:
+            # Only a shortcut, and the file it describes is already written: an
+            # old startup file no longer matches it, so the next start reads it all
+            logger.exception('Could not write the startup file %s', self._startup_path())
+
+    def _load_history(self):
+        """Read the days that reload() skipped"""
+        if self._unloaded:
+            self.reload(history=True)
+
+    def refresh(self):
+        """Reload only if the file was changed outside this store"""
+        with self._lock:
+            if self._stat() != self._signature:
+                self.reload()
+
+    def data(self):
+        """Return the in-memory attendance data, reading any days still on disk"""
+        with self._lock:
+            self.refresh()
+            self._load_history()
+            return self._data
+
+    def day(self, date):
+        """Return the records for one date"""
+        with self._lock:
+            self._refresh_day(date)
+            return self._data.get(date, [])
+
+    def dates(self):
+        """Return every date that has records, oldest first"""
+        with self._lock:
+            self.refresh()
+            return sorted(self._unloaded.union(self._data))
+
+    def query(self, date_from, date_to, staff_id=None, department=None, status=None):
+        """Yield records from date_from to date_to (inclusive) matching the filters, oldest first"""
+        dates = self.dates()
+        for date in dates[bisect_left(dates, date_from):bisect_right(dates, date_to)]:
+            for record in self._query_day(date, staff_id):
+                if department and record.get('department') != department:
+                    continue
+                if status and record.get('status') != status:
+                    continue
+                yield record
+
+    def _query_day(self, date, staff_id=None):
+        """Return a copy of a day's records, or just one staff member's via the index"""
+        with self._lock:
+            self._refresh_day(date)
+            if staff_id:
+                record = self._index(date).by_staff.get(staff_id)
+                return [record] if record else []
+            return list(self._data.get(date, []))
+
+    def _refresh_day(self, date):
+        """Make sure the records for date are current before reading or writing them"""
+        self.refresh()
+        if date in self._unloaded:
+            self._load_history()
+
+    def _index(self, date):
+        """Return the DayIndex for date, building it on first use"""
+        index = self._indexes.get(date)
+        if index is None:
+            index = self._indexes[date] = DayIndex(self._data.get(date, []))
+        return index
+
+    def counts(self, date):
+        """Return the running counts (a DayIndex) for date"""
+        with self._lock:
+            self._refresh_day(date)
+            return self._index(date)
+
+    def page(self, date, after=None, limit=100, descending=False, department=None, status=None):
+        """Return one page of a day's records in check-in order, see DayIndex.page()"""
+        with self._lock:
+            self._refresh_day(date)
+            return self._index(date).page(after, limit, descending, department, status)
+
+    def day_version(self, date):
+        """Return a value that changes whenever date's records change, for caches built from them
+
+        It is a digest of the day's contents, so a reload after another
+        worker wrote (or after a compaction) leaves every other day's
+        version as it was.
+        """
+        with self._lock:
+            self._refresh_day(date)
+            return self._digests.get(date, 0)
+
+    def _reset_digests(self):
+        self._digests = {date: day_digest(records) for date, records in self._data.items()}
+
+    def release(self, dates):
+        """Drop what is cached for days nobody is reading, such as after a bulk import"""
+        # The whole file is the unit of writing here, so only the indexes can go
+        with self._lock:
+            for date in dates:
+                self._indexes.pop(date, None)
+
+    def save(self, data):
+        """Write data to the file and keep it as the in-memory copy"""
+        with self._write_lock, self._lock:
+            self._data = records_from_json(data)
+            self._indexes = {}
+            self._unloaded = set()
+            self._reset_digests()
+            self._write_file()
+            self._recount_rollups()
+
+    def _write_file(self):
+        write_json_atomic(self.path, self._data)
+        self._signature = self._stat()
+        self._write_startup_file()
+
+    def checkin(self, record):
+        """Add a check-in record unless the staff member already has one that day"""
+        return self.apply([{'op': 'checkin', 'record': record}])[0]
+
+    def checkout(self, date, staff_id, checkout_time):
+        """Set the checkout time on a staff member's record for date"""
+        return self.apply([{'op': 'checkout', 'date': date, 'staff_id': staff_id, 'time': checkout_time}])[0]
+
+    def apply(self, events):
+        """Apply events in order and persist the accepted ones in one write, return their outcomes"""
+        if self._flusher is not None:
+            if self._flusher_pid != os.getpid():
+                # Forked from a preloaded app: the flusher stayed in the parent
+                self.start_group_commit(self._flusher_window)
+            outcomes = self._group_commit(events)
+        else:
+            outcomes = self._commit(events)
+        if 'accepted' in outcomes:
+            # Wake wait_for_change() callers
+            with self._changed:
+                self._changed.notify_all()
+        return outcomes
+
+    def wait_for_change(self, timeout):
+        """Block until this process commits a change or timeout seconds pass"""
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def start_group_commit(self, window=0.05):
+        """Commit concurrent apply() calls together, once per window seconds, in a background thread
+
+        A fork does not copy the thread, so a forked worker starts its own
+        on its first apply().
+        """
+        with self._flusher_start:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return
+            # Anything queued belonged to the parent's flusher
+            self._pending = []
+            self._pending_changed = threading.Condition()
+            self._flusher_window = window
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._run_flusher, args=(window,), name='attendance-group-commit', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self, window):
+        while True:
+            with self._pending_changed:
+                while not self._pending:
+                    self._pending_changed.wait()
+            # Let the rest of the rush join this write
+            time.sleep(window)
+            with self._pending_changed:
+                batch, self._pending = self._pending, []
+            self._flush(batch)
+
+    def _group_commit(self, events):
+        """Queue events for the flusher and wait until they are durable"""
+        write = PendingWrite(events)
+        with self._pending_changed:
+            self._pending.append(write)
+            self._pending_changed.notify()
+        if not write.done.wait(self.GROUP_COMMIT_TIMEOUT):
+            raise TimeoutError(f'Group commit did not finish within {self.GROUP_COMMIT_TIMEOUT}s; the write may still land')
+        if write.error is not None:
+            raise write.error
+        return write.outcomes
+
+    def _flush(self, batch):
+        """Commit a batch of queued writes as one, and hand each its outcomes"""
+        events = [event for write in batch for event in write.events]
+        GROUP_COMMIT_EVENTS.observe(len(events))
+        try:
+            outcomes = self._commit(events)
+        except Exception as e:
+            if len(batch) > 1:
+                # Memory was reloaded; retry one by one so a bad write fails alone
+                for write in batch:
+                    self._flush([write])
+            else:
+                batch[0].error = e
+                batch[0].done.set()
+            return
+
+        start = 0
+        for write in batch:
+            write.outcomes = outcomes[start:start + len(write.events)]
+            start += len(write.events)
+            write.done.set()
+
+    def _commit(self, events):
+        """Apply events in memory and persist the accepted ones"""
+        with self._write_lock, self._lock:
+            try:
+                self.refresh()
+                self._load_for_write(events)
+                outcomes, accepted = self._apply_events(events)
+                if accepted:
+                    self._persist(accepted)
+            except Exception:
+                # Drop the unsaved changes so memory matches disk again
+                self.reload()
+                raise
+            # The events are on disk now, so their outcomes stand whatever fails next
+            if accepted:
+                self._count_rollups(accepted)
+            return outcomes
+
+    def _load_for_write(self, events):
+        """Read the days _persist() needs before the events are applied"""
+        # The whole file is rewritten, so every day has to be in memory
+        self._load_history()
+
+    def _apply_events(self, events):
+        """Apply events in memory, return their outcomes and the accepted events"""
+        outcomes = []
+        accepted = []
+        refreshed = set()
+        for event in events:
+            date = event_date(event)
+            if date not in refreshed:
+                # Once per date is enough: the write lock keeps other workers out
+                self._refresh_day(date)
+                refreshed.add(date)
+            outcome = self._apply_event(event, date)
+            outcomes.append(outcome)
+            if outcome == 'accepted':
+                accepted.append(event)
+        return outcomes, accepted
+
+    def _apply_event(self, event, date):
+        """Apply one event to the loaded day, keeping its digest in step"""
+        index = self._index(date)
+        staff_id = event['record']['staff_id'] if event['op'] == 'checkin' else event['staff_id']
+        before = index.by_staff.get(staff_id)
+        # Hashed before the change: a check-out updates the record in place
+        removed = record_hash(before) if before is not None else 0
+        outcome = apply_event(self._data, event, index)
+        if outcome == 'accepted':
+            digest = self._digests.get(date, 0) - removed + record_hash(index.by_staff[staff_id])
+            self._digests[date] = digest & DIGEST_MASK
+        return outcome
+
+    def _persist(self, events):
+        """Write the current data to disk after accepted events"""
+        # The indexes were kept in step, so only the file needs rewriting
+        self._write_file()
+
+    def _count_rollups(self, events):
+        """Add accepted check-ins to the rollups; check-outs do not change a status
+
+        Called once the events are durable, so a failure here is logged and
+        the rollups are recounted later rather than failing the write.
+        """
+        if self.rollups is None:
+            return
+        records = [event['record'] for event in events if event['op'] == 'checkin']
+        if not records and not self._rollups_stale:
+            return
+        try:
+            if self._rollups_stale:
+                # The recount includes these records
+                self.rebuild_rollups()
+            else:
+                self.rollups.add(records)
+        except Exception:
+            self._rollups_stale = True
+            logger.exception('Could not count %d check-ins into the rollups; they will be recounted', len(records))
+
+    def _recount_rollups(self):
+        """Recount the rollups from memory after save() replaced every record"""
+        if self.rollups is None:
+            return
+        try:
+            self.rollups.rebuild(record for records in self._data.values() for record in records)
+            self._rollups_stale = False
+        except Exception:
+            self._rollups_stale = True
+            logger.exception('Could not recount the rollups after a save; they will be recounted')
+
+    def rebuild_rollups(self):
+        """Recount every rollup from the raw records, return how many were counted"""
+        with self._write_lock, self._lock:
+            counted = self.rollups.rebuild(self.query('', '\uffff'))
+            self._rollups_stale = False
+            return counted
+
+    def rollup(self, month, kind, key=None):
+        """Return {key: Counter of statuses} for a month, by 'department' or 'staff'"""
+        if self._rollups_stale:
+            # Outside the store lock, which must not be held while waiting for the write lock
+            self.rebuild_rollups()
+        with self._lock:
+            return self.rollups.query(month, kind, key)
+
+
+class JournaledAttendanceStore(AttendanceStore):
+    """Attendance store that appends events to a log instead of rewriting the file
+
+    The JSON file becomes a snapshot. Each accepted event is appended to
+    the log as one compact line and fsynced. compact() folds the log into
+    a fresh snapshot, and startup replays the snapshot plus the log tail.
+    Appends need only the days they touch, so a store started from the
+    startup file can take check-ins without reading older days.
+    """
+
+    def __init__(self, path, log_path=None, rollups=None):
+        self.log_path = log_path or f'{path}.log'
+        self._log_offset = 0
+        super().__init__(path, rollups=rollups)
+        self._truncate_torn_tail()
+        self._compactor = None
+        self._compactor_pid = None
+        self._compact_interval = None
+
+    def reload(self, history=False):
+        """Read the snapshot and replay the whole log"""
+        with self._lock:
+            super().reload(history)
+            self._log_offset = 0
+            self._replay_log()
+
+    def refresh(self):
+        """Pick up a new snapshot or log entries written by another process"""
+        with self._lock:
+            log_signature = self._stat(self.log_path)
+            log_size = log_signature[2] if log_signature else 0
+            if self._stat() != self._signature or log_size < self._log_offset:
+                self.reload()
+            elif log_size > self._log_offset:
+                self._replay_log()
+
+    def _replay_log(self):
+        """Apply complete log lines written after the current offset"""
+        if not os.path.exists(self.log_path):
+            return
+        with STORAGE_SECONDS.time('load'):
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                chunk = f.read()
+        STORAGE_BYTES.inc(len(chunk), 'load')
+        # A line without its newline is a write still in progress (or torn
+        # by a crash) and is left for a later replay
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if line:
+                # Replay is idempotent, so events already in the snapshot
+                # are simply rejected again
+                event = codec.loads(line)
+                date = event_date(event)
+                # Days still on disk get the whole log replayed when they are read
+                if date not in self._unloaded:
+                    self._apply_event(event, date)
+        self._log_offset += end
+
+    def _truncate_torn_tail(self):
+        """Cut off a partial last line left by a crash during an append"""
+        # Holding the write lock means no other worker is mid-append
+        with self._write_lock, self._lock:
+            self.refresh()
+            log_signature = self._stat(self.log_path)
+            if log_signature and log_signature[2] > self._log_offset:
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(self._log_offset)
+
+    def save(self, data):
+        """Replace all data with a new snapshot and an empty log"""
+        with self._write_lock, self._lock:
+            self._data = records_from_json(data)
+            self._indexes = {}
+            self._unloaded = set()
+            self._reset_digests()
+            self._write_snapshot()
+            self._recount_rollups()
+
+    def _load_for_write(self, events):
+        """Read older days only if the events touch one"""
+        if not self._unloaded.isdisjoint(map(event_date, events)):
+            self._load_history()
+
+    def _persist(self, events):
+        """Append the events to the log with a single write and fsync"""
+        with STORAGE_SECONDS.time('save'):
+            lines = b''.join(codec.dumps(event) + b'\n' for event in events)
+            with open(self.log_path, 'ab') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        STORAGE_BYTES.inc(len(lines), 'save')
+        self._log_offset += len(lines)
+        if self._compactor is not None and self._compactor_pid != os.getpid():
+            # Forked from a preloaded app: the compactor stayed in the parent
+            self.start_compactor(self._compact_interval)
+
+    def _write_snapshot(self):
+        """Write the in-memory data as the snapshot and empty the log"""
+        write_json_atomic(self.path, self._data)
+        self._signature = self._stat()
+        self._write_startup_file()
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self._log_offset = 0
+
+    def compact(self):
+        """Fold the log into the snapshot"""
+        with self._write_lock, self._lock:
+            self.refresh()
+            if self._log_offset:
+                self._load_history()
+                self._write_snapshot()
+
+    def start_compactor(self, interval=60):
+        """Compact the log every interval seconds in a background thread
+
+        A fork does not copy the thread, so a forked worker starts its own
+        on its first append.
+        """
+        if self._compactor is not None and self._compactor_pid == os.getpid():
+            return
+        self._compact_interval = interval
+        self._compactor_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.compact()
+
+        self._compactor = threading.Thread(target=run, name='attendance-compactor', daemon=True)
+        self._compactor.start()
+
+
+class PartitionedAttendanceStore(AttendanceStore):
+    """Attendance store with one JSON file per day and a manifest of dates
+
+    Only the partitions that are actually queried are read, so today's
+    requests never parse historical data. A write rewrites only the
+    partition for its date, plus the manifest when a new day starts.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory, legacy_path=None, rollups=None):
+        self._dates = []
+        self._day_signatures = {}
+        self._manifest_signature = None
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory, rollups=rollups)
+        with self._write_lock:
+            self.refresh()
+            if not self._dates and legacy_path and os.path.exists(legacy_path):
+                # First start after switching layouts: split the single file
+                self.save(read_json(legacy_path))
+
+    def _lock_path(self):
+        return os.path.join(self.path, '.lock')
+
+    def _startup_file_stale(self):
+        # Partitions are already read one day at a time
+        return False
+
+    def _manifest_path(self):
+        return os.path.join(self.path, self.MANIFEST)
+
+    def _partition_path(self, date):
+        return os.path.join(self.path, f'{date}.json')
+
+    def reload(self):
+        """Forget loaded partitions and re-read the manifest"""
+        with self._lock:
+            self._data = {}
+            self._indexes = {}
+            self._day_signatures = {}
+            self._read_manifest()
+
+    def _read_manifest(self):
+        self._manifest_signature = self._stat(self._manifest_path())
+        self._dates = read_json(self._manifest_path()).get('days', [])
+
+    def refresh(self):
+        """Re-read the manifest if another process added a day"""
+        with self._lock:
+            if self._stat(self._manifest_path()) != self._manifest_signature:
+                self._read_manifest()
+
+    def dates(self):
+        """Return every date that has a partition, oldest first"""
+        with self._lock:
+            self.refresh()
+            return list(self._dates)
+
+    def data(self):
+        """Load every partition and return all attendance data"""
+        with self._lock:
+            for date in self.dates():
+                self._refresh_day(date)
+            return self._data
+
+    def _query_day(self, date, staff_id=None):
+        """Read a day for a query, without caching partitions nobody has loaded"""
+        with self._lock:
+            if date in self._day_signatures:
+                return super()._query_day(date, staff_id)
+        # Long-range reports would otherwise pull all of history into memory
+        records = read_json(self._partition_path(date)) or []
+        if staff_id:
+            return [record for record in records if record['staff_id'] == staff_id][:1]
+        return records
+
+    def _refresh_day(self, date):
+        """Load the partition for date if it is not loaded or changed on disk"""
+        path = self._partition_path(date)
+        signature = self._stat(path)
+        if date in self._day_signatures and self._day_signatures[date] == signature:
+            return
+        self._day_signatures[date] = signature
+        self._indexes.pop(date, None)
+        if signature is None:
+            self._data.pop(date, None)
+        else:
+            self._data[date] = [Record.from_dict(record) for record in read_json(path)]
+
+    def day_version(self, date):
+        """Return the partition's file signature, which every write of that day replaces"""
+        return self._stat(self._partition_path(date))
+
+    def release(self, dates):
+        """Forget loaded partitions; they are read again when next needed"""
+        with self._lock:
+            for date in dates:
+                self._data.pop(date, None)
+                self._indexes.pop(date, None)
+                self._day_signatures.pop(date, None)
+
+    def save(self, data):
+        """Rewrite every partition and the manifest from data"""
+        with self._write_lock, self._lock:
+            for date in set(self.dates()) - set(data):
+                os.remove(self._partition_path(date))
+            self._data = records_from_json(data)
+            self._indexes = {}
+            self._day_signatures = {}
+            for date in data:
+                self._write_partition(date)
+            self._write_manifest(sorted(data))
+            self._recount_rollups()
+
+    def _persist(self, events):
+        """Rewrite only the partitions the events touched"""
+        dates = {event_date(event) for event in events}
+        for date in dates:
+            self._write_partition(date)
+        if not dates.issubset(self._dates):
+            self._write_manifest(sorted(dates.union(self._dates)))
+
+    def _write_partition(self, date):
+        path = self._partition_path(date)
+        write_json_atomic(path, self._data[date])
+        self._day_signatures[date] = self._stat(path)
+
+    def _write_manifest(self, dates):
+        write_json_atomic(self._manifest_path(), {'days': dates})
+        self._dates = dates
+        self._manifest_signature = self._stat(self._manifest_path())
+
+
+class SQLiteAttendanceStore(AttendanceStore):
+    """Attendance store backed by an SQLite database in WAL mode
+
+    Records live in one attendance table indexed on (date, staff_id) and
+    (date, department). A check-in is a single INSERT and a check-out a
+    single UPDATE. Days are cached in memory once read; PRAGMA
+    data_version tells when another worker committed, and the cache is
+    dropped.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            staff_id TEXT NOT NULL,
+            staff_name TEXT NOT NULL,
+            department TEXT NOT NULL,
+            status TEXT NOT NULL,
+            checkin_time TEXT NOT NULL,
+            checkout_time TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS attendance_date_staff ON attendance (date, staff_id);
+        CREATE INDEX IF NOT EXISTS attendance_date_department ON attendance (date, department);
+        -- Bumped by every transaction that changes a day, see day_version()
+        CREATE TABLE IF NOT EXISTS day_versions (
+            date TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    '''
+    COLUMNS = ('staff_id', 'staff_name', 'department', 'status', 'checkin_time', 'checkout_time', 'date')
+
+    def __init__(self, path, legacy_path=None):
+        # Rollups share the database, so they commit with the records
+        self._connection = SQLiteConnection(path, self.SCHEMA + Rollups.SCHEMA)
+        self._data_version = None
+        self._loaded_dates = set()
+        super().__init__(path, rollups=Rollups(self._connection))
+        if legacy_path and os.path.exists(legacy_path):
+            with self._lock:
+                empty = self._connection().execute('SELECT 1 FROM attendance LIMIT 1').fetchone() is None
+            if empty:
+                # First start after switching layouts: import the JSON history
+                self.import_data(read_json(legacy_path))
+
+    def _startup_file_stale(self):
+        # Days are already read from the database one at a time
+        return False
+
+    def _row_to_record(self, row):
+        # COLUMNS is in the order Record takes its fields
+        return Record(*row)
+
+    def _record_to_row(self, record):
+        return tuple(record.get(column, EMPTY_TIME if column == 'checkout_time' else '') for column in self.COLUMNS)
+
+    def reload(self):
+        """Forget cached days; they are read again on demand"""
+        with self._lock:
+            self._data = {}
+            self._indexes = {}
+            self._loaded_dates = set()
+            self._data_version = self._connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def refresh(self):
+        """Drop the cache if another connection committed since the last check"""
+        with self._lock:
+            if self._connection().execute('PRAGMA data_version').fetchone()[0] != self._data_version:
+                self.reload()
+
+    def dates(self):
+        """Return every date that has records, oldest first"""
+        with self._lock:
+            rows = self._connection().execute('SELECT DISTINCT date FROM attendance ORDER BY date')
+            return [date for (date,) in rows]
+
+    def data(self):
+        """Load every day and return all attendance data"""
+        with self._lock:
+            for date in self.dates():
+                self._refresh_day(date)
+            return self._data
+
+    def query(self, date_from, date_to, staff_id=None, department=None, status=None):
+        """Yield matching records straight from the indexed table, oldest first"""
+        sql = f'SELECT {", ".join(self.COLUMNS)} FROM attendance WHERE date BETWEEN ? AND ?'
+        params = [date_from, date_to]
+        for column, value in (('staff_id', staff_id), ('department', department), ('status', status)):
+            if value:
+                sql += f' AND {column} = ?'
+                params.append(value)
+        sql += ' ORDER BY date, id'
+
+        # A separate read connection, so a long export never holds the store
+        # lock; WAL lets it read while workers keep writing
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            for row in conn.execute(sql, params):
+                yield self._row_to_record(row)
+        finally:
+            conn.close()
+
+    def _refresh_day(self, date):
+        """Read the records for date unless they are already cached"""
+        self.refresh()
+        if date in self._loaded_dates:
+            return
+        with STORAGE_SECONDS.time('load'):
+            rows = self._connection().execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM attendance WHERE date = ? ORDER BY id', (date,)
+            ).fetchall()
+        if rows:
+            self._data[date] = [self._row_to_record(row) for row in rows]
+        self._loaded_dates.add(date)
+
+    def release(self, dates):
+        """Forget cached days; they are read again when next needed"""
+        with self._lock:
+            for date in dates:
+                self._data.pop(date, None)
+                self._indexes.pop(date, None)
+                self._loaded_dates.discard(date)
+
+    def save(self, data):
+        """Replace every record in the database with data"""
+        def replace(conn):
+            conn.execute('DELETE FROM attendance')
+            conn.execute('UPDATE day_versions SET version = version + 1')
+            self._insert_all(conn, data)
+            # Same transaction, so the counts always match the records
+            self.rollups.rebuild(record for records in data.values() for record in records)
+
+        with self._lock:
+            self._transaction(replace)
+            self._data = records_from_json(data)
+            self._indexes = {}
+            self._loaded_dates = set(data)
+
+    def import_data(self, data):
+        """Insert records from JSON-shaped data, skipping ones already present"""
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            self._transaction(lambda conn: self._insert_all(conn, data, 'INSERT OR IGNORE'))
+            imported = conn.total_changes - before
+            self.reload()
+        # Imported records bypass the write path, so recount
+        self.rebuild_rollups()
+        return imported
+
+    def _insert_sql(self, verb='INSERT'):
+        placeholders = ', '.join('?' for _ in self.COLUMNS)
+        return f'{verb} INTO attendance ({", ".join(self.COLUMNS)}) VALUES ({placeholders})'
+
+    def _insert_all(self, conn, data, verb='INSERT'):
+        conn.executemany(
+            self._insert_sql(verb),
+            (self._record_to_row(record) for records in data.values() for record in records),
+        )
+        self._bump_days(conn, data)
+
+    def _bump_days(self, conn, dates):
+        conn.executemany(
+            'INSERT INTO day_versions (date, version) VALUES (?, 1) '
+            'ON CONFLICT (date) DO UPDATE SET version = version + 1',
+            [(date,) for date in dates]
+        )
+
+    def day_version(self, date):
+        """Return the day's counter in day_versions, which every worker's writes bump"""
+        with self._lock:
+            row = self._connection().execute('SELECT version FROM day_versions WHERE date = ?', (date,)).fetchone()
+        return row[0] if row else 0
+
+    def _transaction(self, work):
+        """Run work(conn) inside BEGIN IMMEDIATE, which holds SQLite's write lock"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = work(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def _commit(self, events):
+        """Decide and write events inside one SQLite write transaction"""
+        def work(conn):
+            outcomes, accepted = self._apply_events(events)
+            if accepted:
+                self._persist(accepted)
+                records = [event['record'] for event in accepted if event['op'] == 'checkin']
+                if records:
+                    # In the same transaction, so a failure rolls the records back with it
+                    self.rollups.add(records)
+            return outcomes
+
+        with self._lock:
+            try:
+                # Includes waiting for SQLite's write lock, like the file layouts' flock
+                with STORAGE_SECONDS.time('save'):
+                    return self._transaction(work)
+            except Exception:
+                # Drop the rolled-back change so memory matches the database
+                self.reload()
+                raise
+
+    def _persist(self, events):
+        """Write the events' INSERTs and UPDATEs in the open transaction"""
+        conn = self._connection()
+        # A check-out was only accepted if its check-in exists or is in this
+        # batch, so inserting every check-in first keeps the result the same
+        conn.executemany(
+            self._insert_sql(),
+            [self._record_to_row(event['record']) for event in events if event['op'] == 'checkin']
+        )
+        conn.executemany(
+            'UPDATE attendance SET checkout_time = ? WHERE date = ? AND staff_id = ?',
+            [(event['time'], event['date'], event['staff_id']) for event in events if event['op'] == 'checkout']
+        )
+        self._bump_days(conn, {event_date(event) for event in events})
+
+
+def open_store(mode, path='attendance.json'):
+    """Open the store for a storage mode
+
+    path is the single JSON file used by the json and journal modes; the
+    other layouts live next to it and import it on first start.
+    """
+    base = os.path.splitext(path)[0]
+    # File layouts keep their rollups in a small SQLite database beside them
+    rollups = Rollups(SQLiteConnection(f'{base}.rollups.db', Rollups.SCHEMA))
+    if mode == 'json':
+        store = AttendanceStore(path, rollups=rollups)
+    elif mode == 'journal':
+        store = JournaledAttendanceStore(path, rollups=rollups)
+    elif mode == 'partitioned':
+        store = PartitionedAttendanceStore(base, legacy_path=path, rollups=rollups)
+    elif mode == 'sqlite':
+        store = SQLiteAttendanceStore(f'{base}.db', legacy_path=path)
+    else:
+        raise ValueError(f'Unknown storage mode: {mode!r}')
+
+    # Existing history from before rollups were kept is counted once
+    if store.rollups.is_empty() and store.dates():
+        store.rebuild_rollups()
+    return store
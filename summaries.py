@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date as Date
+
+from metrics import SUMMARY_LOOKUPS
+from records import MISSING, format_minutes, minute_of_day
+
+# Days kept per staff member, today included
+WINDOW = 30
+# Statuses that count as attending, as in the day's stats
+PRESENT_STATUSES = ('Present', 'Late', 'Half Day')
+
+
+class StaffSummary:
+    """One staff member's last WINDOW days as a ring buffer, with running totals
+
+    Slot ordinal % WINDOW holds (ordinal, status, check-in minute) for
+    that day, so setting a day replaces whatever fell out of the window
+    in its place and adjusts the totals, and every figure is read
+    without walking the history.
+    """
+
+    __slots__ = ('staff_id', 'staff_name', 'department', 'end', 'built', '_days', 'statuses', '_checkin_total', '_checkins')
+
+    def __init__(self, staff_id, end):
+        self.staff_id = staff_id
+        self.staff_name = ''
+        self.department = ''
+        self.end = end
+        self.built = time.monotonic()
+        self._days = [None] * WINDOW
+        self.statuses = Counter()
+        self._checkin_total = 0
+        self._checkins = 0
+
+    def set(self, record):
+        """Store a record's day, replacing what was there"""
+        ordinal = Date.fromisoformat(record['date']).toordinal()
+        if not self.end - WINDOW < ordinal <= self.end:
+            return
+        self.clear(ordinal)
+        checkin = minute_of_day(record['checkin_time'])
+        self._days[ordinal % WINDOW] = (ordinal, record['status'], checkin)
+        self.statuses[record['status']] += 1
+        if checkin != MISSING:
+            self._checkin_total += checkin
+            self._checkins += 1
+        self.staff_name = record['staff_name']
+        self.department = record['department']
+
+    def clear(self, ordinal):
+        """Forget whatever is stored in a day's slot"""
+        slot = ordinal % WINDOW
+        day = self._days[slot]
+        if day is None:
+            return
+        _, status, checkin = day
+        self.statuses[status] -= 1
+        if checkin != MISSING:
+            self._checkin_total -= checkin
+            self._checkins -= 1
+        self._days[slot] = None
+
+    def _status(self, ordinal):
+        day = self._days[ordinal % WINDOW]
+        return day[1] if day is not None and day[0] == ordinal else None
+
+    def streak(self):
+        """Consecutive days attended up to today, or up to yesterday before today's check-in"""
+        ordinal = self.end if self._status(self.end) is not None else self.end - 1
+        streak = 0
+        while ordinal > self.end - WINDOW and self._status(ordinal) in PRESENT_STATUSES:
+            streak += 1
+            ordinal -= 1
+        return streak
+
+    def to_dict(self):
+        recorded = sum(day is not None for day in self._days)
+        # Today only counts as missed once it has passed
+        no_record = WINDOW - recorded - (self._status(self.end) is None)
+        return {
+            'staff_id': self.staff_id,
+            'staff_name': self.staff_name,
+            'department': self.department,
+            'from': Date.fromordinal(self.end - WINDOW + 1).isoformat(),
+            'to': Date.fromordinal(self.end).isoformat(),
+            'days': WINDOW,
+            'present': sum(self.statuses[status] for status in PRESENT_STATUSES),
+            'late': self.statuses['Late'],
+            # Like the day's stats, days without a check-in are absences
+            'absent': self.statuses['Absent'] + no_record,
+            'no_record': no_record,
+            'statuses': {status: n for status, n in self.statuses.items() if n},
+            'streak': self.streak(),
+            'average_checkin': format_minutes(round(self._checkin_total / self._checkins)) if self._checkins else None,
+            'today': self._status(self.end),
+        }
+
+
+class StaffSummaries:
+    """LRU cache of StaffSummary by staff ID, built from the store on first lookup
+
+    record() updates a cached summary on each accepted check-in. Today's
+    day is re-read from the store's index on every lookup, which is a
+    dict lookup, so check-ins taken by other workers show at once. A
+    summary is rebuilt when the day changes or after max_age seconds,
+    which bounds how long older days changed elsewhere (an import, or a
+    batch for an earlier date sent to another worker) stay stale.
+    """
+
+    def __init__(self, store, capacity=10000, max_age=300):
+        self.store = store
+        self.capacity = capacity
+        self.max_age = max_age
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, staff_id, today):
+        """Return the summary for the WINDOW days up to today ('YYYY-MM-DD') as a dict"""
+        end = Date.fromisoformat(today).toordinal()
+        record = self.store.counts(today).by_staff.get(staff_id)
+        with self._lock:
+            summary = self._summaries.get(staff_id)
+            if summary is not None and (summary.end != end or time.monotonic() - summary.built > self.max_age):
+                del self._summaries[staff_id]
+                summary = None
+            if summary is not None:
+                self._summaries.move_to_end(staff_id)
+                self._set_today(summary, end, record)
+                SUMMARY_LOOKUPS.inc(1, 'hit')
+                return summary.to_dict()
+
+        SUMMARY_LOOKUPS.inc(1, 'miss')
+        # Built outside the lock: it reads up to WINDOW days from the store
+        summary = StaffSummary(staff_id, end)
+        first = Date.fromordinal(end - WINDOW + 1).isoformat()
+        for past in self.store.query(first, today, staff_id=staff_id):
+            summary.set(past)
+        with self._lock:
+            self._set_today(summary, end, record)
+            self._summaries[staff_id] = summary
+            self._summaries.move_to_end(staff_id)
+            while len(self._summaries) > self.capacity:
+                # The staff member looked up longest ago goes first
+                self._summaries.popitem(last=False)
+            return summary.to_dict()
+
+    @staticmethod
+    def _set_today(summary, end, record):
+        if record is not None:
+            summary.set(record)
+        else:
+            summary.clear(end)
+
+    def record(self, record):
+        """Apply an accepted check-in to its staff member's cached summary, if there is one"""
+        with self._lock:
+            summary = self._summaries.get(record['staff_id'])
+            if summary is not None:
+                summary.set(record)
+
+    def __len__(self):
+        return len(self._summaries)